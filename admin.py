@@ -1,95 +1,59 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, User, Cliente, Fornecedor, Pedido, TransacaoCashback, BeneficioFornecedor, ConfiguracaoSistema
-from src.routes.auth import token_required, admin_required
-from datetime import datetime, timedelta
-from sqlalchemy import func, extract, or_
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from src.models.user import db, User, Cliente, Fornecedor, Pedido, TransacaoCashback, BeneficioFornecedor, ConfiguracaoSistema, ResumoMensalCliente, TokenRevogado, reconciliar_cashback
+from src.routes.auth import token_required, admin_required, invalidar_usuario, registrar_revogacao, registrar_remocao
+from src.utils.paginacao import paginar_por_cursor, limitar_por_pagina
+from src.utils.importacao import ImportadorCompras, ler_registros
+from src.utils.relatorios import (
+    DIMENSOES_RELATORIO, DIMENSOES_CUBO, GRANULARIDADES_CUBO, calcular_relatorio_vendas,
+    atualizar_cubo_vendas, reconstruir_cubo_vendas, consultar_cubo_vendas, reagregar_dias_cubo
+)
+from src.utils.paineis import dashboard_admin, invalidar_paineis
+from src.utils.busca import aplicar_busca
+from src.utils.catalogo import invalidar_catalogo
+from src.utils.serializacao import Projecao, serializador
+from datetime import datetime
+import csv
+import io
+import json
+from sqlalchemy.orm import selectinload
 
 admin_bp = Blueprint('admin', __name__)
 
+def filtrar_pedidos(query, args):
+    """Aplica os filtros de status, cliente e período das listagens de pedidos"""
+    status = args.get('status')
+    cliente_id = args.get('cliente_id', type=int)
+    data_inicio = args.get('data_inicio')
+    data_fim = args.get('data_fim')
+    
+    if status:
+        query = query.filter(Pedido.status == status)
+    
+    if cliente_id:
+        query = query.filter(Pedido.cliente_id == cliente_id)
+    
+    if data_inicio:
+        data_inicio_dt = datetime.strptime(data_inicio, '%Y-%m-%d')
+        query = query.filter(Pedido.data_pedido >= data_inicio_dt)
+    
+    if data_fim:
+        data_fim_dt = datetime.strptime(data_fim, '%Y-%m-%d')
+        query = query.filter(Pedido.data_pedido <= data_fim_dt)
+    
+    return query
+
 @admin_bp.route('/dashboard', methods=['GET'])
-@token_required
+@token_required(claims_only=True)
 @admin_required
 def get_admin_dashboard(current_user):
     try:
-        # Estatísticas gerais
-        total_clientes = Cliente.query.count()
-        total_fornecedores = Fornecedor.query.count()
-        
-        # Fornecedores pendentes de aprovação
-        fornecedores_pendentes = User.query.filter(
-            User.tipo_usuario == 'fornecedor',
-            User.aprovado == False
-        ).count()
-        
-        # Pedidos do mês atual
-        mes_atual = datetime.now().month
-        ano_atual = datetime.now().year
-        
-        pedidos_mes = Pedido.query.filter(
-            extract('month', Pedido.data_pedido) == mes_atual,
-            extract('year', Pedido.data_pedido) == ano_atual
-        ).count()
-        
-        # Faturamento do mês
-        faturamento_mes = db.session.query(func.sum(Pedido.valor_total)).filter(
-            extract('month', Pedido.data_pedido) == mes_atual,
-            extract('year', Pedido.data_pedido) == ano_atual
-        ).scalar() or 0
-        
-        # Volume de café do mês
-        volume_mes = db.session.query(func.sum(Pedido.quantidade_kg)).filter(
-            extract('month', Pedido.data_pedido) == mes_atual,
-            extract('year', Pedido.data_pedido) == ano_atual
-        ).scalar() or 0
-        
-        # Cashback total acumulado
-        cashback_total = db.session.query(func.sum(Cliente.cashback_acumulado)).scalar() or 0
-        
-        # Últimos pedidos
-        ultimos_pedidos = db.session.query(Pedido, Cliente, User).join(
-            Cliente, Pedido.cliente_id == Cliente.id
-        ).join(
-            User, Cliente.user_id == User.id
-        ).order_by(Pedido.data_pedido.desc()).limit(10).all()
-        
-        # Distribuição por nível de parceria
-        niveis = db.session.query(
-            Cliente.nivel_parceria,
-            func.count(Cliente.id).label('count')
-        ).group_by(Cliente.nivel_parceria).all()
-        
-        return jsonify({
-            'estatisticas': {
-                'total_clientes': total_clientes,
-                'total_fornecedores': total_fornecedores,
-                'fornecedores_pendentes': fornecedores_pendentes,
-                'pedidos_mes': pedidos_mes,
-                'faturamento_mes': float(faturamento_mes),
-                'volume_mes': float(volume_mes),
-                'cashback_total': float(cashback_total)
-            },
-            'ultimos_pedidos': [
-                {
-                    'pedido': pedido.to_dict(),
-                    'cliente': {
-                        'nome': user.nome,
-                        'email': user.email,
-                        'empresa': cliente.empresa
-                    }
-                }
-                for pedido, cliente, user in ultimos_pedidos
-            ],
-            'distribuicao_niveis': [
-                {'nivel': nivel, 'count': count}
-                for nivel, count in niveis
-            ]
-        }), 200
+        return jsonify(dashboard_admin()), 200
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @admin_bp.route('/usuarios', methods=['GET'])
-@token_required
+@token_required(claims_only=True)
 @admin_required
 def get_usuarios(current_user):
     try:
@@ -100,7 +64,16 @@ def get_usuarios(current_user):
         status = request.args.get('status')  # ativo, inativo, pendente
         busca = request.args.get('busca')
         
-        query = User.query
+        # Com ?fields=/?expand=, só as colunas e relações pedidas saem do banco
+        projecao = Projecao.da_requisicao(User, request.args)
+        if projecao:
+            query = User.query.options(*projecao.opcoes(carregar=['data_criacao']))
+        else:
+            # Perfis e benefícios carregados em lote (selectin): consultas fixas por página
+            query = User.query.options(
+                selectinload(User.cliente),
+                selectinload(User.fornecedor).selectinload(Fornecedor.beneficios)
+            )
         
         if tipo_usuario:
             query = query.filter(User.tipo_usuario == tipo_usuario)
@@ -112,20 +85,37 @@ def get_usuarios(current_user):
         elif status == 'pendente':
             query = query.filter(User.aprovado == False)
         
+        relevancia = None
         if busca:
-            query = query.filter(
-                or_(
-                    User.nome.ilike(f'%{busca}%'),
-                    User.email.ilike(f'%{busca}%')
-                )
+            query, relevancia = aplicar_busca(query, busca)
+        
+        # Modo cursor (opcional): páginas por keyset, sem COUNT
+        if 'after' in request.args:
+            per_page = limitar_por_pagina(per_page)
+            itens, next_cursor = paginar_por_cursor(
+                query, [User.data_criacao, User.id], request.args.get('after'), per_page,
+                chave=lambda u: (u.data_criacao, u.id)
             )
-        
-        usuarios = query.order_by(User.data_criacao.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+            paginacao = {'next_cursor': next_cursor, 'per_page': per_page}
+        else:
+            # Com busca, os resultados mais relevantes vêm primeiro
+            ordem = [User.data_criacao.desc()] if relevancia is None else [relevancia, User.data_criacao.desc()]
+            usuarios = query.order_by(*ordem).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            itens = usuarios.items
+            paginacao = {
+                'total': usuarios.total,
+                'pages': usuarios.pages,
+                'current_page': page,
+                'per_page': per_page
+            }
         
         resultado = []
-        for user in usuarios.items:
+        for user in itens:
+            if projecao:
+                resultado.append(projecao.serializar(user))
+                continue
             user_data = user.to_dict()
             if user.tipo_usuario == 'cliente' and user.cliente:
                 user_data['cliente'] = user.cliente.to_dict()
@@ -135,12 +125,11 @@ def get_usuarios(current_user):
         
         return jsonify({
             'usuarios': resultado,
-            'total': usuarios.total,
-            'pages': usuarios.pages,
-            'current_page': page,
-            'per_page': per_page
+            **paginacao
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -158,6 +147,9 @@ def aprovar_fornecedor(current_user, user_id):
         
         user.aprovado = True
         db.session.commit()
+        invalidar_usuario(user.id)
+        invalidar_paineis()
+        invalidar_catalogo()
         
         return jsonify({'message': 'Fornecedor aprovado com sucesso'}), 200
         
@@ -177,8 +169,13 @@ def rejeitar_fornecedor(current_user, user_id):
         if user.tipo_usuario != 'fornecedor':
             return jsonify({'message': 'Usuário não é um fornecedor'}), 400
         
+        # Revogação gravada junto com a remoção: vale para todos os processos
+        emitidos_ate = TokenRevogado.registrar(user_id)
         db.session.delete(user)
         db.session.commit()
+        registrar_remocao(user_id, emitidos_ate)
+        invalidar_paineis()
+        invalidar_catalogo()
         
         return jsonify({'message': 'Fornecedor rejeitado e removido'}), 200
         
@@ -199,8 +196,18 @@ def toggle_usuario(current_user, user_id):
             return jsonify({'message': 'Não é possível desativar sua própria conta'}), 400
         
         user.ativo = not user.ativo
+        if not user.ativo:
+            user.revogar_tokens()
         db.session.commit()
         
+        if user.ativo:
+            registrar_revogacao(user.id, user.token_version)
+        else:
+            registrar_revogacao(user.id)
+        invalidar_paineis()
+        if user.tipo_usuario == 'fornecedor':
+            invalidar_catalogo()
+        
         status = 'ativado' if user.ativo else 'desativado'
         return jsonify({'message': f'Usuário {status} com sucesso'}), 200
         
@@ -209,17 +216,13 @@ def toggle_usuario(current_user, user_id):
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @admin_bp.route('/pedidos', methods=['GET'])
-@token_required
+@token_required(claims_only=True)
 @admin_required
 def get_pedidos(current_user):
     try:
         # Parâmetros de filtro e paginação
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
-        status = request.args.get('status')
-        cliente_id = request.args.get('cliente_id', type=int)
-        data_inicio = request.args.get('data_inicio')
-        data_fim = request.args.get('data_fim')
         
         query = db.session.query(Pedido, Cliente, User).join(
             Cliente, Pedido.cliente_id == Cliente.id
@@ -227,28 +230,33 @@ def get_pedidos(current_user):
             User, Cliente.user_id == User.id
         )
         
-        if status:
-            query = query.filter(Pedido.status == status)
-        
-        if cliente_id:
-            query = query.filter(Pedido.cliente_id == cliente_id)
-        
-        if data_inicio:
-            data_inicio_dt = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(Pedido.data_pedido >= data_inicio_dt)
-        
-        if data_fim:
-            data_fim_dt = datetime.strptime(data_fim, '%Y-%m-%d')
-            query = query.filter(Pedido.data_pedido <= data_fim_dt)
-        
-        pedidos = query.order_by(Pedido.data_pedido.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        query = filtrar_pedidos(query, request.args)
         
+        # Modo cursor (opcional): páginas por keyset, sem COUNT
+        if 'after' in request.args:
+            per_page = limitar_por_pagina(per_page)
+            itens, next_cursor = paginar_por_cursor(
+                query, [Pedido.data_pedido, Pedido.id], request.args.get('after'), per_page,
+                chave=lambda linha: (linha[0].data_pedido, linha[0].id)
+            )
+            paginacao = {'next_cursor': next_cursor, 'per_page': per_page}
+        else:
+            pedidos = query.order_by(Pedido.data_pedido.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            itens = pedidos.items
+            paginacao = {
+                'total': pedidos.total,
+                'pages': pedidos.pages,
+                'current_page': page,
+                'per_page': per_page
+            }
+        
+        serializar = serializador(Pedido)
         resultado = []
-        for pedido, cliente, user in pedidos.items:
+        for pedido, cliente, user in itens:
             resultado.append({
-                'pedido': pedido.to_dict(),
+                'pedido': serializar(pedido),
                 'cliente': {
                     'id': cliente.id,
                     'nome': user.nome,
@@ -260,12 +268,87 @@ def get_pedidos(current_user):
         
         return jsonify({
             'pedidos': resultado,
-            'total': pedidos.total,
-            'pages': pedidos.pages,
-            'current_page': page,
-            'per_page': per_page
+            **paginacao
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+COLUNAS_EXPORTACAO = [
+    ('id', Pedido.id),
+    ('data_pedido', Pedido.data_pedido),
+    ('data_entrega', Pedido.data_entrega),
+    ('status', Pedido.status),
+    ('tipo_cafe', Pedido.tipo_cafe),
+    ('tipo_torra', Pedido.tipo_torra),
+    ('quantidade_kg', Pedido.quantidade_kg),
+    ('valor_total', Pedido.valor_total),
+    ('automatico', Pedido.automatico),
+    ('cliente_id', Cliente.id),
+    ('cliente_nome', User.nome),
+    ('cliente_email', User.email),
+    ('cliente_empresa', Cliente.empresa),
+    ('cliente_cidade', Cliente.cidade),
+    ('cliente_estado', Cliente.estado),
+    ('nivel_parceria', Cliente.nivel_parceria)
+]
+
+@admin_bp.route('/exportar-pedidos', methods=['GET'])
+@token_required(claims_only=True)
+@admin_required
+def exportar_pedidos(current_user):
+    """Exporta pedidos em CSV ou NDJSON como stream, com os filtros de /pedidos"""
+    try:
+        formato = request.args.get('formato', 'csv')
+        if formato not in ['csv', 'ndjson']:
+            return jsonify({'message': 'Formato inválido'}), 400
+        
+        nomes = [nome for nome, _ in COLUNAS_EXPORTACAO]
+        query = db.session.query(*[coluna for _, coluna in COLUNAS_EXPORTACAO]).join(
+            Cliente, Pedido.cliente_id == Cliente.id
+        ).join(
+            User, Cliente.user_id == User.id
+        )
+        query = filtrar_pedidos(query, request.args).order_by(Pedido.data_pedido, Pedido.id)
+        
+        def valor(v):
+            return v.isoformat() if isinstance(v, datetime) else v
+        
+        def gerar_csv():
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(nomes)
+            for i, linha in enumerate(query.yield_per(1000), start=1):
+                escritor.writerow([valor(v) for v in linha])
+                if i % 500 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        
+        def gerar_ndjson():
+            partes = []
+            for linha in query.yield_per(1000):
+                partes.append(json.dumps(dict(zip(nomes, map(valor, linha))), ensure_ascii=False))
+                if len(partes) == 500:
+                    yield '\n'.join(partes) + '\n'
+                    partes = []
+            if partes:
+                yield '\n'.join(partes) + '\n'
+        
+        gerador = gerar_csv() if formato == 'csv' else gerar_ndjson()
+        nome_arquivo = f"pedidos-{datetime.now().strftime('%Y%m%d%H%M%S')}.{formato}"
+        
+        return Response(
+            stream_with_context(gerador),
+            mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+        )
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -284,12 +367,25 @@ def atualizar_status_pedido(current_user, pedido_id):
         if novo_status not in ['pendente', 'processando', 'entregue', 'cancelado']:
             return jsonify({'message': 'Status inválido'}), 400
         
+        status_anterior = pedido.status
         pedido.status = novo_status
         
+        # Cancelamentos (e reativações) ajustam o resumo mensal do cliente
+        if (status_anterior == 'cancelado') != (novo_status == 'cancelado'):
+            ResumoMensalCliente.registrar_pedido(pedido, sinal=-1 if novo_status == 'cancelado' else 1)
+            agora = datetime.now()
+            pedido.cliente.atualizar_nivel_parceria(agora.year, agora.month)
+        
         if novo_status == 'entregue' and not pedido.data_entrega:
             pedido.data_entrega = datetime.utcnow()
         
+        # O status é dimensão do cubo de vendas: refazer o dia do pedido
+        if novo_status != status_anterior:
+            reagregar_dias_cubo([pedido.data_pedido])
+        
         db.session.commit()
+        invalidar_usuario(pedido.cliente.user_id)
+        invalidar_paineis()
         
         return jsonify({'message': 'Status do pedido atualizado com sucesso'}), 200
         
@@ -327,12 +423,16 @@ def adicionar_compra_manual(current_user):
             observacoes=data.get('observacoes', 'Compra adicionada manualmente pelo administrador')
         )
         
+        # Taxa pelo nível vigente do cliente, antes de somar esta compra
+        taxa_cashback = cliente.get_taxa_cashback()
+        valor_cashback = data['valor_total'] * taxa_cashback
+        
         db.session.add(pedido)
         db.session.flush()
         
-        # Calcular e adicionar cashback
-        taxa_cashback = cliente.get_taxa_cashback()
-        valor_cashback = data['valor_total'] * taxa_cashback
+        # Atualizar resumo mensal e cubo de vendas na mesma transação
+        ResumoMensalCliente.registrar_pedido(pedido)
+        reagregar_dias_cubo([pedido.data_pedido])
         
         transacao_cashback = TransacaoCashback(
             cliente_id=cliente.id,
@@ -342,24 +442,16 @@ def adicionar_compra_manual(current_user):
             descricao=f'Cashback da compra manual #{pedido.id}'
         )
         
-        cliente.cashback_acumulado += valor_cashback
+        Cliente.creditar_cashback(cliente.id, valor_cashback)
         cliente.data_ultima_compra = pedido.data_pedido
         
         # Recalcular nível de parceria
-        mes_pedido = pedido.data_pedido.month
-        ano_pedido = pedido.data_pedido.year
-        
-        total_mes = db.session.query(func.sum(Pedido.quantidade_kg)).filter(
-            Pedido.cliente_id == cliente.id,
-            extract('month', Pedido.data_pedido) == mes_pedido,
-            extract('year', Pedido.data_pedido) == ano_pedido
-        ).scalar() or 0
-        
-        cliente.total_compras_mes = total_mes
-        cliente.nivel_parceria = cliente.calcular_nivel_parceria()
+        cliente.atualizar_nivel_parceria(pedido.data_pedido.year, pedido.data_pedido.month)
         
         db.session.add(transacao_cashback)
         db.session.commit()
+        invalidar_usuario(cliente.user_id)
+        invalidar_paineis()
         
         return jsonify({
             'message': 'Compra manual adicionada com sucesso',
@@ -372,9 +464,67 @@ def adicionar_compra_manual(current_user):
         db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
-@admin_bp.route('/relatorio-vendas', methods=['GET'])
+@admin_bp.route('/importar-compras', methods=['POST'])
 @token_required
 @admin_required
+def importar_compras(current_user):
+    """Importa compras manuais em massa a partir de CSV ou NDJSON (corpo ou campo 'arquivo')"""
+    try:
+        arquivo = request.files.get('arquivo')
+        fluxo = arquivo.stream if arquivo else request.stream
+        nome = (arquivo.filename or '') if arquivo else ''
+        tipo = (arquivo.mimetype if arquivo else request.mimetype) or ''
+        
+        formato = request.args.get('formato')
+        if not formato:
+            formato = 'ndjson' if 'json' in tipo or nome.endswith(('.ndjson', '.jsonl')) else 'csv'
+        if formato not in ['csv', 'ndjson']:
+            return jsonify({'message': 'Formato inválido'}), 400
+        
+        tamanho_lote = max(1, min(request.args.get('lote', 1000, type=int), 10000))
+        
+        importador = ImportadorCompras(tamanho_lote=tamanho_lote)
+        relatorio = importador.processar(ler_registros(fluxo, formato))
+        
+        for user_id in importador.usuarios_afetados():
+            invalidar_usuario(user_id)
+        invalidar_paineis()
+        
+        return jsonify(relatorio), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/reconciliar-cashback', methods=['POST'])
+@token_required
+@admin_required
+def reconciliar_cashback_clientes(current_user):
+    try:
+        data = request.get_json(silent=True) or {}
+        corrigir = bool(data.get('corrigir', False))
+        
+        divergencias = reconciliar_cashback(corrigir=corrigir)
+        
+        if corrigir:
+            db.session.commit()
+            for divergencia in divergencias:
+                invalidar_usuario(divergencia['user_id'])
+            invalidar_paineis()
+        
+        return jsonify({
+            'divergencias': divergencias,
+            'total_divergencias': len(divergencias),
+            'corrigido': corrigir
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/relatorio-vendas', methods=['GET'])
+@token_required(claims_only=True)
+@admin_required
 def relatorio_vendas(current_user):
     try:
         # Parâmetros de período
@@ -387,94 +537,152 @@ def relatorio_vendas(current_user):
         data_inicio_dt = datetime.strptime(data_inicio, '%Y-%m-%d')
         data_fim_dt = datetime.strptime(data_fim, '%Y-%m-%d')
         
-        # Vendas no período
-        vendas = Pedido.query.filter(
-            Pedido.data_pedido >= data_inicio_dt,
-            Pedido.data_pedido <= data_fim_dt,
-            Pedido.status.in_(['entregue', 'processando'])
-        ).all()
-        
-        # Estatísticas
-        total_vendas = len(vendas)
-        faturamento_total = sum(v.valor_total for v in vendas)
-        volume_total = sum(v.quantidade_kg for v in vendas)
-        ticket_medio = faturamento_total / total_vendas if total_vendas > 0 else 0
-        
-        # Vendas por mês
-        vendas_por_mes = db.session.query(
-            extract('year', Pedido.data_pedido).label('ano'),
-            extract('month', Pedido.data_pedido).label('mes'),
-            func.count(Pedido.id).label('quantidade'),
-            func.sum(Pedido.valor_total).label('faturamento'),
-            func.sum(Pedido.quantidade_kg).label('volume')
-        ).filter(
-            Pedido.data_pedido >= data_inicio_dt,
-            Pedido.data_pedido <= data_fim_dt,
-            Pedido.status.in_(['entregue', 'processando'])
-        ).group_by(
-            extract('year', Pedido.data_pedido),
-            extract('month', Pedido.data_pedido)
-        ).all()
-        
-        # Top clientes
-        top_clientes = db.session.query(
-            Cliente.id,
-            User.nome,
-            Cliente.empresa,
-            func.count(Pedido.id).label('total_pedidos'),
-            func.sum(Pedido.valor_total).label('total_gasto'),
-            func.sum(Pedido.quantidade_kg).label('total_kg')
-        ).join(
-            User, Cliente.user_id == User.id
-        ).join(
-            Pedido, Cliente.id == Pedido.cliente_id
-        ).filter(
-            Pedido.data_pedido >= data_inicio_dt,
-            Pedido.data_pedido <= data_fim_dt,
-            Pedido.status.in_(['entregue', 'processando'])
-        ).group_by(
-            Cliente.id, User.nome, Cliente.empresa
-        ).order_by(
-            func.sum(Pedido.valor_total).desc()
-        ).limit(10).all()
+        dimensoes = [d for d in request.args.get('dimensoes', '').split(',') if d]
+        for dimensao in dimensoes:
+            if dimensao not in DIMENSOES_RELATORIO:
+                return jsonify({'message': f'Dimensão inválida: {dimensao}'}), 400
         
-        return jsonify({
+        relatorio = calcular_relatorio_vendas(data_inicio_dt, data_fim_dt, dimensoes)
+        
+        resposta = {
             'periodo': {
                 'data_inicio': data_inicio,
                 'data_fim': data_fim
             },
-            'resumo': {
-                'total_vendas': total_vendas,
-                'faturamento_total': float(faturamento_total),
-                'volume_total': float(volume_total),
-                'ticket_medio': float(ticket_medio)
+            'resumo': relatorio['resumo'],
+            'vendas_por_mes': relatorio['vendas_por_mes'],
+            'top_clientes': relatorio['top_clientes']
+        }
+        if dimensoes:
+            resposta['por_dimensao'] = relatorio['por_dimensao']
+        
+        return jsonify(resposta), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/cubo-vendas', methods=['GET'])
+@token_required(claims_only=True)
+@admin_required
+def get_cubo_vendas(current_user):
+    """Consulta o cubo de vendas diário agregado por período e dimensões.
+
+    Somente leitura: as rotas que gravam pedidos mantêm o cubo na mesma
+    transação; POST /cubo-vendas/atualizar e `flask reconstruir-cubo-vendas`
+    cobrem alterações feitas direto no banco.
+    """
+    try:
+        data_inicio = request.args.get('data_inicio')
+        data_fim = request.args.get('data_fim')
+        
+        if not data_inicio or not data_fim:
+            return jsonify({'message': 'Data de início e fim são obrigatórias'}), 400
+        
+        data_inicio_dt = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+        data_fim_dt = datetime.strptime(data_fim, '%Y-%m-%d').date()
+        
+        granularidade = request.args.get('granularidade', 'dia')
+        if granularidade not in GRANULARIDADES_CUBO:
+            return jsonify({'message': 'Granularidade inválida'}), 400
+        
+        dimensoes = [d for d in request.args.get('dimensoes', '').split(',') if d]
+        for dimensao in dimensoes:
+            if dimensao not in DIMENSOES_CUBO:
+                return jsonify({'message': f'Dimensão inválida: {dimensao}'}), 400
+        
+        # Filtros por dimensão: ?status=entregue,processando&estado=SP
+        filtros = {
+            dimensao: request.args.get(dimensao).split(',')
+            for dimensao in DIMENSOES_CUBO
+            if request.args.get(dimensao)
+        }
+        
+        return jsonify({
+            'periodo': {
+                'data_inicio': data_inicio,
+                'data_fim': data_fim
             },
-            'vendas_por_mes': [
-                {
-                    'ano': int(ano),
-                    'mes': int(mes),
-                    'quantidade': quantidade,
-                    'faturamento': float(faturamento),
-                    'volume': float(volume)
-                }
-                for ano, mes, quantidade, faturamento, volume in vendas_por_mes
-            ],
-            'top_clientes': [
-                {
-                    'cliente_id': cliente_id,
-                    'nome': nome,
-                    'empresa': empresa,
-                    'total_pedidos': total_pedidos,
-                    'total_gasto': float(total_gasto),
-                    'total_kg': float(total_kg)
-                }
-                for cliente_id, nome, empresa, total_pedidos, total_gasto, total_kg in top_clientes
-            ]
+            'granularidade': granularidade,
+            'dimensoes': dimensoes,
+            'linhas': consultar_cubo_vendas(data_inicio_dt, data_fim_dt, granularidade, dimensoes, filtros)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/cubo-vendas/atualizar', methods=['POST'])
+@token_required
+@admin_required
+def atualizar_cubo(current_user):
+    try:
+        if request.args.get('completo') == '1':
+            reconstruir_cubo_vendas()
+            return jsonify({'message': 'Cubo de vendas reconstruído'}), 200
+        
+        dias = atualizar_cubo_vendas()
+        return jsonify({'message': 'Cubo de vendas atualizado', 'dias_reprocessados': dias}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/analitico/snapshot', methods=['POST'])
+@token_required
+@admin_required
+def gerar_snapshot_analitico(current_user):
+    try:
+        from src.utils import analitico  # NumPy só é importado quando usado
+        metadados = analitico.gerar_snapshot()
+        return jsonify({'message': 'Snapshot analítico gerado', 'snapshot': metadados}), 201
+        
+    except RuntimeError as e:
+        return jsonify({'message': str(e)}), 503
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+def _analise(analise, *args):
+    """Executa uma análise do módulo analitico sobre o snapshot atual, tratando a ausência dele"""
+    try:
+        from src.utils import analitico  # NumPy só é importado quando usado
+        snapshot = analitico.carregar_snapshot()
+        if snapshot is None:
+            return jsonify({'message': 'Nenhum snapshot analítico gerado'}), 404
+        
+        return jsonify({
+            'snapshot': snapshot.metadados,
+            'resultado': getattr(analitico, analise)(snapshot, *args)
         }), 200
         
+    except RuntimeError as e:
+        return jsonify({'message': str(e)}), 503
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
+@admin_bp.route('/analitico/media-movel', methods=['GET'])
+@token_required(claims_only=True)
+@admin_required
+def get_media_movel(current_user):
+    janela = max(1, request.args.get('janela', 7, type=int))
+    dias = max(1, min(request.args.get('dias', 90, type=int), 3660))
+    return _analise('media_movel', janela, dias)
+
+@admin_bp.route('/analitico/sazonalidade', methods=['GET'])
+@token_required(claims_only=True)
+@admin_required
+def get_sazonalidade(current_user):
+    cliente_id = request.args.get('cliente_id', type=int)
+    limite = max(1, min(request.args.get('limite', 20, type=int), 1000))
+    return _analise('sazonalidade_clientes', cliente_id, limite)
+
+@admin_bp.route('/analitico/coortes', methods=['GET'])
+@token_required(claims_only=True)
+@admin_required
+def get_coortes(current_user):
+    meses = max(1, min(request.args.get('meses', 12, type=int), 120))
+    return _analise('receita_coortes', meses)
+
 @admin_bp.route('/criar-admin', methods=['POST'])
 @token_required
 @admin_required
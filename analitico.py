@@ -0,0 +1,273 @@
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from src.models.user import db, Cliente, Pedido, TransacaoCashback, NIVEIS_PARCERIA
+
+try:
+    import numpy as np
+except ImportError:  # Análises ficam indisponíveis sem NumPy
+    np = None
+
+DIRETORIO_ANALITICO = os.environ.get(
+    'ANALYTICS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'analitico')
+)
+
+STATUS_PEDIDO = ['pendente', 'processando', 'entregue', 'cancelado']
+TIPOS_CASHBACK = ['ganho', 'uso']
+EPOCA = date(1970, 1, 1)
+TAMANHO_LOTE = 5000
+
+
+def _dia(valor):
+    return (valor.date() - EPOCA).days if valor else -1
+
+
+def _mes(valor):
+    return valor.year * 12 + valor.month - 1 if valor else -1
+
+
+def _codigo(opcoes):
+    return lambda valor: opcoes.index(valor) if valor in opcoes else -1
+
+
+def _exportar_tabela(diretorio, tabela, consulta, colunas):
+    """Grava cada coluna da consulta em um .npy mapeado em memória, em lotes"""
+    total = consulta.order_by(None).count()
+    arrays = [
+        np.lib.format.open_memmap(
+            os.path.join(diretorio, f'{tabela}.{nome}.npy'), mode='w+', dtype=dtype, shape=(total,)
+        )
+        for nome, dtype, _ in colunas
+    ]
+
+    posicao = 0
+    lote = []
+    for linha in consulta.yield_per(TAMANHO_LOTE):
+        if posicao + len(lote) >= total:
+            break
+        lote.append(linha)
+        if len(lote) == TAMANHO_LOTE:
+            posicao = _gravar_lote(arrays, colunas, lote, posicao)
+            lote = []
+    if lote:
+        posicao = _gravar_lote(arrays, colunas, lote, posicao)
+
+    for array in arrays:
+        array.flush()
+    return posicao
+
+
+def _gravar_lote(arrays, colunas, lote, posicao):
+    for i, (array, (_, _, conversor)) in enumerate(zip(arrays, colunas)):
+        array[posicao:posicao + len(lote)] = [conversor(linha[i]) for linha in lote]
+    return posicao + len(lote)
+
+
+def gerar_snapshot(diretorio=DIRETORIO_ANALITICO, manter=2):
+    """Exporta pedidos, cashback e clientes para colunas NumPy (.npy) no disco.
+
+    Cada snapshot fica em um subdiretório próprio; o arquivo ATUAL aponta para o
+    mais recente, para que leitores nunca vejam um snapshot pela metade.
+    """
+    if np is None:
+        raise RuntimeError('NumPy não está instalado')
+
+    os.makedirs(diretorio, exist_ok=True)
+    gerado_em = datetime.utcnow()
+    nome = f"snapshot-{gerado_em.strftime('%Y%m%d%H%M%S%f')}"
+    destino = os.path.join(diretorio, nome)
+    os.makedirs(destino)
+
+    linhas = {
+        'pedidos': _exportar_tabela(destino, 'pedidos', db.session.query(
+            Pedido.cliente_id, Pedido.data_pedido, Pedido.data_pedido,
+            Pedido.valor_total, Pedido.quantidade_kg, Pedido.status
+        ).order_by(Pedido.id), [
+            ('cliente_id', 'int32', int),
+            ('dia', 'int32', _dia),
+            ('mes', 'int32', _mes),
+            ('valor', 'float64', float),
+            ('kg', 'float64', float),
+            ('status', 'int8', _codigo(STATUS_PEDIDO))
+        ]),
+        'cashback': _exportar_tabela(destino, 'cashback', db.session.query(
+            TransacaoCashback.cliente_id, TransacaoCashback.data_transacao,
+            TransacaoCashback.tipo, TransacaoCashback.valor
+        ).order_by(TransacaoCashback.id), [
+            ('cliente_id', 'int32', int),
+            ('dia', 'int32', _dia),
+            ('tipo', 'int8', _codigo(TIPOS_CASHBACK)),
+            ('valor', 'float64', float)
+        ]),
+        'clientes': _exportar_tabela(destino, 'clientes', db.session.query(
+            Cliente.id, Cliente.nivel_parceria, Cliente.estado
+        ).order_by(Cliente.id), [
+            ('id', 'int32', int),
+            ('nivel', 'int8', _codigo(NIVEIS_PARCERIA)),
+            ('estado', 'U2', lambda valor: valor or '')
+        ])
+    }
+
+    metadados = {'nome': nome, 'gerado_em': gerado_em.isoformat(), 'linhas': linhas}
+    with open(os.path.join(destino, 'metadados.json'), 'w') as arquivo:
+        json.dump(metadados, arquivo)
+
+    temporario = os.path.join(diretorio, 'ATUAL.tmp')
+    with open(temporario, 'w') as arquivo:
+        arquivo.write(nome)
+    os.replace(temporario, os.path.join(diretorio, 'ATUAL'))
+
+    antigos = sorted(d for d in os.listdir(diretorio) if d.startswith('snapshot-') and d != nome)
+    for antigo in antigos[:max(0, len(antigos) - (manter - 1))]:
+        shutil.rmtree(os.path.join(diretorio, antigo), ignore_errors=True)
+
+    return metadados
+
+
+class Snapshot:
+    """Acesso somente leitura às colunas de um snapshot via mmap"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(os.path.join(caminho, 'metadados.json')) as arquivo:
+            self.metadados = json.load(arquivo)
+        self._colunas = {}
+
+    def coluna(self, tabela, nome):
+        chave = f'{tabela}.{nome}'
+        if chave not in self._colunas:
+            self._colunas[chave] = np.load(os.path.join(self.caminho, f'{chave}.npy'), mmap_mode='r')
+        return self._colunas[chave]
+
+
+_snapshot_atual = None
+
+
+def carregar_snapshot(diretorio=DIRETORIO_ANALITICO):
+    """Retorna o snapshot mais recente (reaproveitado entre requisições) ou None"""
+    global _snapshot_atual
+    if np is None:
+        raise RuntimeError('NumPy não está instalado')
+
+    try:
+        with open(os.path.join(diretorio, 'ATUAL')) as arquivo:
+            nome = arquivo.read().strip()
+    except FileNotFoundError:
+        return None
+
+    snapshot = _snapshot_atual
+    if snapshot is None or os.path.basename(snapshot.caminho) != nome:
+        snapshot = Snapshot(os.path.join(diretorio, nome))
+        _snapshot_atual = snapshot
+    return snapshot
+
+
+def _vendas(snapshot):
+    """Máscara dos pedidos que contam como venda (não cancelados e com data)"""
+    return (
+        (snapshot.coluna('pedidos', 'status') != STATUS_PEDIDO.index('cancelado'))
+        & (snapshot.coluna('pedidos', 'dia') >= 0)
+    )
+
+
+def _rotulo_mes(mes):
+    return f'{mes // 12:04d}-{mes % 12 + 1:02d}'
+
+
+def media_movel(snapshot, janela=7, dias=90):
+    """Faturamento diário e sua média móvel dos últimos `dias` dias do snapshot"""
+    vendas = _vendas(snapshot)
+    dia = snapshot.coluna('pedidos', 'dia')[vendas]
+    valor = snapshot.coluna('pedidos', 'valor')[vendas]
+    if dia.size == 0:
+        return []
+
+    fim = int(dia.max())
+    inicio = fim - dias - janela + 2
+    selecao = dia >= inicio
+    serie = np.bincount(dia[selecao] - inicio, weights=valor[selecao], minlength=fim - inicio + 1)
+
+    acumulado = np.concatenate(([0.0], np.cumsum(serie)))
+    medias = (acumulado[janela:] - acumulado[:-janela]) / janela
+
+    primeiro = inicio + janela - 1
+    return [
+        {
+            'dia': (EPOCA + timedelta(days=primeiro + i)).isoformat(),
+            'faturamento': float(serie[janela - 1 + i]),
+            'media_movel': float(media)
+        }
+        for i, media in enumerate(medias)
+    ]
+
+
+def sazonalidade_clientes(snapshot, cliente_id=None, limite=20):
+    """Participação de cada mês do ano no faturamento de cada cliente"""
+    vendas = _vendas(snapshot)
+    clientes = snapshot.coluna('pedidos', 'cliente_id')[vendas]
+    mes = snapshot.coluna('pedidos', 'mes')[vendas]
+    valor = snapshot.coluna('pedidos', 'valor')[vendas]
+    if clientes.size == 0:
+        return []
+
+    ids, indices = np.unique(clientes, return_inverse=True)
+    matriz = np.bincount(
+        indices * 12 + mes % 12, weights=valor, minlength=ids.size * 12
+    ).reshape(ids.size, 12)
+    totais = matriz.sum(axis=1)
+    participacao = matriz / np.where(totais > 0, totais, 1)[:, None]
+    # Coeficiente de variação mensal: 0 para compras uniformes ao longo do ano
+    medias = matriz.mean(axis=1)
+    variacao = matriz.std(axis=1) / np.where(medias > 0, medias, 1)
+
+    if cliente_id is not None:
+        selecionados = np.flatnonzero(ids == cliente_id)
+    else:
+        selecionados = np.argsort(-totais)[:limite]
+
+    return [
+        {
+            'cliente_id': int(ids[i]),
+            'faturamento_total': float(totais[i]),
+            'participacao_mensal': [round(float(p), 4) for p in participacao[i]],
+            'indice_sazonalidade': round(float(variacao[i]), 4)
+        }
+        for i in selecionados
+    ]
+
+
+def receita_coortes(snapshot, meses=12):
+    """Faturamento por coorte (mês da primeira compra) e meses desde a entrada"""
+    vendas = _vendas(snapshot)
+    clientes = snapshot.coluna('pedidos', 'cliente_id')[vendas]
+    mes = snapshot.coluna('pedidos', 'mes')[vendas]
+    valor = snapshot.coluna('pedidos', 'valor')[vendas]
+    if clientes.size == 0:
+        return []
+
+    ids, indices = np.unique(clientes, return_inverse=True)
+    primeiro_mes = np.full(ids.size, np.iinfo(np.int32).max, dtype=np.int64)
+    np.minimum.at(primeiro_mes, indices, mes)
+
+    coorte = primeiro_mes[indices]
+    idade = mes - coorte
+    dentro = idade < meses
+
+    coortes, coorte_indices = np.unique(coorte, return_inverse=True)
+    receita = np.bincount(
+        coorte_indices[dentro] * meses + idade[dentro],
+        weights=valor[dentro],
+        minlength=coortes.size * meses
+    ).reshape(coortes.size, meses)
+    tamanho = np.bincount(np.searchsorted(coortes, primeiro_mes), minlength=coortes.size)
+
+    return [
+        {
+            'coorte': _rotulo_mes(int(c)),
+            'clientes': int(tamanho[i]),
+            'receita_por_mes': [round(float(v), 2) for v in receita[i]]
+        }
+        for i, c in enumerate(coortes)
+    ]
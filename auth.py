@@ -1,14 +1,130 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash
-from src.models.user import db, User, Cliente, Fornecedor
+from src.models.user import db, User, Cliente, Fornecedor, TokenRevogado
+from src.utils.cache import CacheTTL
+from src.utils.paineis import invalidar_paineis
+from src.utils.catalogo import invalidar_catalogo
+from src.utils.relatorios import reagregar_cliente_cubo
+from src.utils.serializacao import Projecao
 import jwt
 import os
+import threading
+import time
 from functools import wraps
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
 
-def token_required(f):
+# Intervalo de ressincronização das revogações com o banco. É também o prazo
+# para que desativações, trocas de senha e remoções feitas em outro processo
+# (outro worker do gunicorn) valham neste: o processo que faz a alteração a
+# aplica na hora, os demais na próxima sincronização.
+REVOGACOES_TTL = float(os.environ.get('AUTH_REVOCATION_TTL', '30'))
+
+# Cache do usuário autenticado (com perfil) por user_id; o TTL não passa do
+# intervalo de sincronização, e a sincronização descarta os usuários alterados
+_cache_usuarios = CacheTTL(
+    maxsize=int(os.environ.get('AUTH_CACHE_SIZE', '1024')),
+    ttl=min(float(os.environ.get('AUTH_CACHE_TTL', REVOGACOES_TTL)), REVOGACOES_TTL)
+)
+
+def invalidar_usuario(user_id):
+    """Remove o usuário do cache de autenticação após alterações"""
+    _cache_usuarios.invalidate(user_id)
+
+def carregar_usuario(user_id):
+    """Carrega o usuário e seu perfil, reaproveitando o cache em memória"""
+    user = _cache_usuarios.get(user_id)
+    if user is None:
+        user = User.query.options(
+            db.joinedload(User.cliente),
+            db.joinedload(User.fornecedor)
+        ).filter(User.id == user_id).first()
+        if not user:
+            return None
+        # A cópia em cache fica desanexada para não expirar nos commits da requisição
+        db.session.expunge(user)
+        _cache_usuarios.set(user_id, user)
+    return db.session.merge(user, load=False)
+
+# Revogações de token: user_id -> menor versão de token aceita (None revoga todas).
+# Só contém usuários com revogações; é ressincronizado do banco periodicamente
+# para refletir revogações feitas por outros processos.
+_revogacoes = {}
+# Contas removidas: user_id -> instante (iat) até o qual os tokens foram revogados,
+# lido da tabela TokenRevogado
+_remocoes = {}
+_revogacoes_lock = threading.Lock()
+_revogacoes_sincronizado_em = None
+
+def _sincronizar_revogacoes():
+    global _revogacoes, _remocoes, _revogacoes_sincronizado_em
+    agora = time.monotonic()
+    if _revogacoes_sincronizado_em is not None and agora - _revogacoes_sincronizado_em < REVOGACOES_TTL:
+        return
+    
+    linhas = db.session.query(User.id, User.token_version, User.ativo).filter(
+        db.or_(User.token_version > 0, User.ativo == False)
+    ).all()
+    revogacoes = {
+        user_id: (token_version if ativo else None)
+        for user_id, token_version, ativo in linhas
+    }
+    remocoes = TokenRevogado.vigentes()
+    
+    with _revogacoes_lock:
+        # Usuários alterados por outros processos saem do cache de autenticação
+        alterados = [
+            user_id for user_id in _revogacoes.keys() | revogacoes.keys() | remocoes.keys()
+            if _revogacoes.get(user_id, 0) != revogacoes.get(user_id, 0)
+            or _remocoes.get(user_id) != remocoes.get(user_id)
+        ]
+        _revogacoes = revogacoes
+        _remocoes = remocoes
+        _revogacoes_sincronizado_em = agora
+    for user_id in alterados:
+        invalidar_usuario(user_id)
+
+def registrar_revogacao(user_id, versao_minima=None):
+    """Registra localmente a revogação dos tokens anteriores a versao_minima (ou de todos)"""
+    with _revogacoes_lock:
+        _revogacoes[user_id] = versao_minima
+    invalidar_usuario(user_id)
+
+def registrar_remocao(user_id, emitidos_ate):
+    """Aplica localmente a revogação de uma conta removida (já gravada com TokenRevogado.registrar)"""
+    with _revogacoes_lock:
+        _revogacoes.pop(user_id, None)
+        _remocoes[user_id] = emitidos_ate
+    invalidar_usuario(user_id)
+
+def token_revogado(user_id, versao, emitido_em=0):
+    _sincronizar_revogacoes()
+    emitidos_ate = _remocoes.get(user_id)
+    if emitidos_ate is not None and emitido_em <= emitidos_ate:
+        return True
+    if user_id not in _revogacoes:
+        return False
+    versao_minima = _revogacoes[user_id]
+    return versao_minima is None or versao < versao_minima
+
+class UsuarioToken:
+    """Identidade do usuário montada apenas a partir das claims do token"""
+
+    def __init__(self, data):
+        self.id = data['user_id']
+        self.tipo_usuario = data.get('tipo_usuario')
+        self.token_version = data.get('ver', 0)
+
+def token_required(f=None, claims_only=False):
+    """Exige um token válido e não revogado.
+
+    Com claims_only=True a rota recebe um UsuarioToken em vez do usuário do banco,
+    adequado para rotas somente leitura que dependem apenas do tipo de usuário.
+    """
+    if f is None:
+        return lambda func: token_required(func, claims_only=claims_only)
+
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
@@ -21,10 +137,20 @@ def token_required(f):
                 token = token[7:]
             
             data = jwt.decode(token, os.environ.get('SECRET_KEY', 'default-secret'), algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
             
-            if not current_user:
-                return jsonify({'message': 'Token inválido'}), 401
+            if token_revogado(data['user_id'], data.get('ver', 0), data.get('iat', 0)):
+                return jsonify({'message': 'Token revogado'}), 401
+            
+            if claims_only:
+                current_user = UsuarioToken(data)
+            else:
+                current_user = carregar_usuario(data['user_id'])
+                
+                if not current_user:
+                    return jsonify({'message': 'Token inválido'}), 401
+                
+                if not current_user.ativo:
+                    return jsonify({'message': 'Conta desativada'}), 401
                 
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token expirado'}), 401
@@ -104,6 +230,7 @@ def register():
             db.session.add(fornecedor)
         
         db.session.commit()
+        invalidar_paineis()
         
         # Gerar token apenas se aprovado ou se for cliente
         if user.aprovado:
@@ -131,7 +258,13 @@ def login():
         if not data.get('email') or not data.get('password'):
             return jsonify({'message': 'Email e senha são obrigatórios'}), 400
         
-        user = User.query.filter_by(email=data['email']).first()
+        # Relações pedidas em ?expand= carregadas em lote; sem parâmetros, payload completo
+        projecao = Projecao.da_requisicao(User, request.args)
+        query = User.query
+        if projecao:
+            query = query.options(*projecao.opcoes(incluir_raiz=False))
+        
+        user = query.filter_by(email=data['email']).first()
         
         if not user or not user.check_password(data['password']):
             return jsonify({'message': 'Credenciais inválidas'}), 401
@@ -145,11 +278,14 @@ def login():
         token = user.generate_token()
         
         # Incluir dados específicos do perfil
-        user_data = user.to_dict()
-        if user.tipo_usuario == 'cliente' and user.cliente:
-            user_data['cliente'] = user.cliente.to_dict()
-        elif user.tipo_usuario == 'fornecedor' and user.fornecedor:
-            user_data['fornecedor'] = user.fornecedor.to_dict()
+        if projecao:
+            user_data = projecao.serializar(user)
+        else:
+            user_data = user.to_dict()
+            if user.tipo_usuario == 'cliente' and user.cliente:
+                user_data['cliente'] = user.cliente.to_dict()
+            elif user.tipo_usuario == 'fornecedor' and user.fornecedor:
+                user_data['fornecedor'] = user.fornecedor.to_dict()
         
         return jsonify({
             'message': 'Login realizado com sucesso',
@@ -157,6 +293,8 @@ def login():
             'user': user_data
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -164,6 +302,10 @@ def login():
 @token_required
 def get_current_user(current_user):
     try:
+        projecao = Projecao.da_requisicao(User, request.args)
+        if projecao:
+            return jsonify({'user': projecao.serializar(current_user)}), 200
+        
         user_data = current_user.to_dict()
         
         if current_user.tipo_usuario == 'cliente' and current_user.cliente:
@@ -173,6 +315,8 @@ def get_current_user(current_user):
         
         return jsonify({'user': user_data}), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -191,9 +335,14 @@ def update_profile(current_user):
         # Atualizar dados específicos do perfil
         if current_user.tipo_usuario == 'cliente' and current_user.cliente:
             cliente = current_user.cliente
+            endereco_anterior = (cliente.estado, cliente.cidade)
             for field in ['empresa', 'cnpj', 'endereco', 'cidade', 'estado', 'cep']:
                 if field in data:
                     setattr(cliente, field, data[field])
+            
+            # Estado e cidade são dimensões do cubo de vendas
+            if (cliente.estado, cliente.cidade) != endereco_anterior:
+                reagregar_cliente_cubo(cliente.id)
                     
         elif current_user.tipo_usuario == 'fornecedor' and current_user.fornecedor:
             fornecedor = current_user.fornecedor
@@ -202,6 +351,10 @@ def update_profile(current_user):
                     setattr(fornecedor, field, data[field])
         
         db.session.commit()
+        invalidar_usuario(current_user.id)
+        invalidar_paineis()
+        if current_user.tipo_usuario == 'fornecedor':
+            invalidar_catalogo()
         
         return jsonify({'message': 'Perfil atualizado com sucesso'}), 200
         
@@ -222,9 +375,14 @@ def change_password(current_user):
             return jsonify({'message': 'Senha atual incorreta'}), 400
         
         current_user.set_password(data['new_password'])
+        versao = current_user.revogar_tokens()
         db.session.commit()
+        registrar_revogacao(current_user.id, versao)
         
-        return jsonify({'message': 'Senha alterada com sucesso'}), 200
+        return jsonify({
+            'message': 'Senha alterada com sucesso',
+            'token': current_user.generate_token()
+        }), 200
         
     except Exception as e:
         db.session.rollback()
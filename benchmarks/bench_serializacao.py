@@ -0,0 +1,130 @@
+"""Micro-benchmark da serialização JSON de uma página de pedidos.
+
+Compara o caminho antigo (to_dict + provedor JSON padrão do Flask) com o atual
+(serializador gerado por modelo + ProvedorJSON, com orjson quando instalado)
+em dois formatos: a lista simples de pedidos e as linhas de /api/admin/pedidos,
+cada pedido com o cliente aninhado.
+
+Uso: python benchmarks/bench_serializacao.py [--pedidos 1000] [--repeticoes 30]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from src.main import create_app
+from src.models.user import db, User, Cliente, Pedido
+from src.utils.provedor_json import orjson
+from src.utils.serializacao import serializador
+
+CLIENTES = 50
+
+
+def medir(funcao, repeticoes):
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def cliente_aninhado(cliente, user):
+    return {
+        'id': cliente.id,
+        'nome': user.nome,
+        'email': user.email,
+        'empresa': cliente.empresa,
+        'nivel_parceria': cliente.nivel_parceria
+    }
+
+
+def comparar(app, padrao, antigo, atual, repeticoes):
+    """Confere que os dois caminhos geram o mesmo documento e mede cada um (ms)"""
+    assert json.loads(padrao.dumps(antigo())) == json.loads(app.json.dumps(atual())), 'Payloads diferentes'
+    with app.test_request_context():
+        return (
+            medir(lambda: padrao.response(antigo()), repeticoes),
+            medir(lambda: app.json.response(atual()), repeticoes)
+        )
+
+
+def relatar(titulo, tempo_antigo, tempo_atual):
+    print(titulo)
+    print(f'  {"to_dict + json padrão":<28} {tempo_antigo:7.2f} ms')
+    print(f'  {"serializador + ProvedorJSON":<28} {tempo_atual:7.2f} ms  ({tempo_antigo / tempo_atual:.2f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=1000)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(pasta, 'bench.db')}"})
+        with app.app_context():
+            db.create_all()
+            users = [
+                User(email=f'bench{i}@teste.com', nome=f'Bench {i}', tipo_usuario='cliente', password_hash='x')
+                for i in range(CLIENTES)
+            ]
+            db.session.add_all(users)
+            db.session.flush()
+            clientes = [Cliente(user_id=user.id, empresa=f'Empresa {user.id}') for user in users]
+            db.session.add_all(clientes)
+            db.session.flush()
+            db.session.execute(db.insert(Pedido), [
+                {
+                    'cliente_id': clientes[i % CLIENTES].id,
+                    'quantidade_kg': 1.5,
+                    'tipo_cafe': 'graos',
+                    'tipo_torra': 'media',
+                    'valor_total': 12.3,
+                    'status': 'entregue',
+                    'observacoes': 'x' * 40
+                }
+                for i in range(args.pedidos)
+            ])
+            db.session.commit()
+            pedidos = Pedido.query.all()
+            # Mesma consulta de /api/admin/pedidos: (Pedido, Cliente, User) por linha
+            linhas = db.session.query(Pedido, Cliente, User).join(
+                Cliente, Pedido.cliente_id == Cliente.id
+            ).join(
+                User, Cliente.user_id == User.id
+            ).all()
+
+            padrao = DefaultJSONProvider(app)
+            serializar = serializador(Pedido)
+
+            lista = comparar(
+                app, padrao,
+                lambda: {'pedidos': [p.to_dict() for p in pedidos]},
+                lambda: {'pedidos': [serializar(p) for p in pedidos]},
+                args.repeticoes
+            )
+            aninhado = comparar(
+                app, padrao,
+                lambda: {'pedidos': [
+                    {'pedido': p.to_dict(), 'cliente': cliente_aninhado(c, u)} for p, c, u in linhas
+                ]},
+                lambda: {'pedidos': [
+                    {'pedido': serializar(p), 'cliente': cliente_aninhado(c, u)} for p, c, u in linhas
+                ]},
+                args.repeticoes
+            )
+
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f'{args.pedidos} pedidos, {args.repeticoes} repetições (orjson: {"sim" if orjson else "não"})')
+    relatar('Lista de pedidos', *lista)
+    relatar(f'/api/admin/pedidos ({CLIENTES} clientes, cliente aninhado)', *aninhado)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark de leitura/escrita concorrente no SQLite por perfil de pragmas.
+
+Processos escritores (INSERT + commit) e leitores (agregado sobre a tabela)
+disputam o mesmo arquivo, como workers do gunicorn. Cada perfil de
+PERFIS_SQLITE é comparado com o SQLite sem pragmas ('padrao').
+
+Uso: python benchmarks/bench_sqlite_pragmas.py [--segundos 3] [--escritores 4] [--leitores 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.perfil_sqlite import PERFIS_SQLITE
+
+LINHAS_INICIAIS = 50000
+
+
+def conectar(caminho, pragmas):
+    # Mesmo tempo de espera pelo lock do pysqlite padrão; os pragmas podem sobrescrevê-lo
+    conexao = sqlite3.connect(caminho, timeout=5)
+    for nome, valor in pragmas.items():
+        conexao.execute(f'PRAGMA {nome} = {valor}')
+    return conexao
+
+
+def escritor(caminho, pragmas, segundos, fila):
+    conexao = conectar(caminho, pragmas)
+    ok = erros = 0
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        try:
+            conexao.execute('INSERT INTO venda (valor, descricao) VALUES (?, ?)', (1.5, 'x' * 50))
+            conexao.commit()
+            ok += 1
+        except sqlite3.OperationalError:
+            conexao.rollback()
+            erros += 1
+    fila.put(('escritas', ok, erros))
+
+
+def leitor(caminho, pragmas, segundos, fila):
+    conexao = conectar(caminho, pragmas)
+    ok = erros = 0
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        try:
+            conexao.execute('SELECT count(*), sum(valor) FROM venda').fetchone()
+            ok += 1
+        except sqlite3.OperationalError:
+            erros += 1
+    fila.put(('leituras', ok, erros))
+
+
+def executar(pasta, nome, pragmas, args):
+    caminho = os.path.join(pasta, f'{nome}.db')
+    conexao = sqlite3.connect(caminho)
+    conexao.execute('CREATE TABLE venda (id INTEGER PRIMARY KEY, valor REAL, descricao TEXT)')
+    conexao.executemany(
+        'INSERT INTO venda (valor, descricao) VALUES (?, ?)', [(1.0, 'y' * 50)] * LINHAS_INICIAIS
+    )
+    conexao.commit()
+    conexao.close()
+
+    fila = multiprocessing.Queue()
+    processos = [
+        multiprocessing.Process(target=escritor, args=(caminho, pragmas, args.segundos, fila))
+        for _ in range(args.escritores)
+    ] + [
+        multiprocessing.Process(target=leitor, args=(caminho, pragmas, args.segundos, fila))
+        for _ in range(args.leitores)
+    ]
+    for processo in processos:
+        processo.start()
+
+    totais = {'escritas': [0, 0], 'leituras': [0, 0]}
+    for _ in processos:
+        tipo, ok, erros = fila.get()
+        totais[tipo][0] += ok
+        totais[tipo][1] += erros
+    for processo in processos:
+        processo.join()
+    return totais
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--segundos', type=float, default=3)
+    parser.add_argument('--escritores', type=int, default=4)
+    parser.add_argument('--leitores', type=int, default=4)
+    args = parser.parse_args()
+
+    perfis = {'padrao': {}, **PERFIS_SQLITE}
+    print(f'{args.escritores} escritores + {args.leitores} leitores, {args.segundos:g}s por perfil')
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, pragmas in perfis.items():
+            totais = executar(pasta, nome, pragmas, args)
+            escritas, erros_escrita = totais['escritas']
+            leituras, erros_leitura = totais['leituras']
+            print(
+                f'  {nome:<16} escritas/s {escritas / args.segundos:8.0f} (erros {erros_escrita})'
+                f'   leituras/s {leituras / args.segundos:8.0f} (erros {erros_leitura})'
+            )
+
+
+if __name__ == '__main__':
+    main()
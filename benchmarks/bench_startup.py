@@ -0,0 +1,70 @@
+"""Benchmark de partida a frio: import de src.main, create_app e primeira requisição.
+
+Cada rodada usa um interpretador novo, para medir os imports de verdade. Com
+--com-inicializacao, a rodada também executa inicializar_banco() antes da
+primeira requisição, como acontecia em toda partida antes da fábrica.
+
+Uso: python benchmarks/bench_startup.py [--rodadas 5] [--com-inicializacao]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RODADA = '''
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+from src.main import create_app, inicializar_banco
+importado = time.perf_counter()
+app = create_app({{'SQLALCHEMY_DATABASE_URI': {uri!r}}})
+criado = time.perf_counter()
+if {inicializar!r}:
+    with app.app_context():
+        inicializar_banco()
+inicializado = time.perf_counter()
+resposta = app.test_client().get('/api/saude')
+fim = time.perf_counter()
+assert resposta.status_code == 200, resposta.status_code
+print(json.dumps({{
+    'import': importado - inicio,
+    'create_app': criado - importado,
+    'inicializar_banco': inicializado - criado,
+    'primeira_requisicao': fim - inicializado,
+    'total': fim - inicio
+}}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rodadas', type=int, default=5)
+    parser.add_argument('--com-inicializacao', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        uri = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+        # Banco já criado, como em produção após `flask inicializar-banco`
+        subprocess.run(
+            [sys.executable, '-c', RODADA.format(raiz=RAIZ, uri=uri, inicializar=True)],
+            check=True, capture_output=True
+        )
+
+        codigo = RODADA.format(raiz=RAIZ, uri=uri, inicializar=args.com_inicializacao)
+        rodadas = []
+        for _ in range(args.rodadas):
+            saida = subprocess.run([sys.executable, '-c', codigo], check=True, capture_output=True, text=True)
+            rodadas.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+
+    print(f'{args.rodadas} rodadas{" com inicializar_banco()" if args.com_inicializacao else ""} (mediana)')
+    for etapa in ['import', 'create_app', 'inicializar_banco', 'primeira_requisicao', 'total']:
+        print(f'  {etapa:<20} {statistics.median(r[etapa] for r in rodadas) * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
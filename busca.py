@@ -0,0 +1,118 @@
+import re
+import time
+from sqlalchemy import column, literal_column, or_, table
+from sqlalchemy.exc import OperationalError
+from src.models.user import db, User
+
+# Índice FTS5 com nome, email e empresa de cada usuário (rowid = user.id),
+# mantido pelo próprio SQLite via triggers nas tabelas de origem
+TABELA_BUSCA = 'busca_usuarios'
+
+_DDL_BUSCA = [
+    f"""CREATE VIRTUAL TABLE {TABELA_BUSCA} USING fts5(
+        nome, email, empresa, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_user_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO {TABELA_BUSCA}(rowid, nome, email, empresa) VALUES (new.id, new.nome, new.email, '');
+    END""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_user_au AFTER UPDATE OF nome, email ON "user" BEGIN
+        UPDATE {TABELA_BUSCA} SET nome = new.nome, email = new.email WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_user_ad AFTER DELETE ON "user" BEGIN
+        DELETE FROM {TABELA_BUSCA} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_cliente_ai AFTER INSERT ON cliente BEGIN
+        UPDATE {TABELA_BUSCA} SET empresa = coalesce(new.empresa, '') WHERE rowid = new.user_id;
+    END""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_cliente_au AFTER UPDATE OF empresa ON cliente BEGIN
+        UPDATE {TABELA_BUSCA} SET empresa = coalesce(new.empresa, '') WHERE rowid = new.user_id;
+    END""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_fornecedor_ai AFTER INSERT ON fornecedor BEGIN
+        UPDATE {TABELA_BUSCA} SET empresa = coalesce(new.nome_empresa, '') WHERE rowid = new.user_id;
+    END""",
+    f"""CREATE TRIGGER {TABELA_BUSCA}_fornecedor_au AFTER UPDATE OF nome_empresa ON fornecedor BEGIN
+        UPDATE {TABELA_BUSCA} SET empresa = coalesce(new.nome_empresa, '') WHERE rowid = new.user_id;
+    END""",
+    f"""INSERT INTO {TABELA_BUSCA}(rowid, nome, email, empresa)
+        SELECT u.id, u.nome, u.email, coalesce(c.empresa, f.nome_empresa, '')
+        FROM "user" u
+        LEFT JOIN cliente c ON c.user_id = u.id
+        LEFT JOIN fornecedor f ON f.user_id = u.id"""
+]
+
+_busca = table(TABELA_BUSCA, column('rowid'), column('rank'))
+# Resultado definitivo por processo: True com o índice criado, False sem suporte
+# a FTS5. Sem a tabela (ex.: antes de `flask inicializar-banco`), a existência é
+# verificada de novo a cada INTERVALO_VERIFICACAO segundos.
+_indice_disponivel = None
+_verificado_em = None
+INTERVALO_VERIFICACAO = 30
+
+
+def criar_indice_busca():
+    """Cria e popula o índice de busca se ainda não existir; False sem suporte a FTS5"""
+    global _indice_disponivel
+    if db.engine.dialect.name != 'sqlite':
+        _indice_disponivel = False
+        return False
+
+    if db.inspect(db.engine).has_table(TABELA_BUSCA):
+        _indice_disponivel = True
+        return True
+
+    try:
+        with db.engine.begin() as conexao:
+            for comando in _DDL_BUSCA:
+                conexao.execute(db.text(comando))
+        _indice_disponivel = True
+    except OperationalError:
+        # SQLite compilado sem FTS5: as buscas usam ILIKE
+        _indice_disponivel = False
+    return _indice_disponivel
+
+
+def indice_disponivel():
+    global _indice_disponivel, _verificado_em
+    if _indice_disponivel is not None:
+        return _indice_disponivel
+
+    if db.engine.dialect.name != 'sqlite':
+        _indice_disponivel = False
+        return False
+
+    agora = time.monotonic()
+    if _verificado_em is not None and agora - _verificado_em < INTERVALO_VERIFICACAO:
+        return False
+    _verificado_em = agora
+    if db.inspect(db.engine).has_table(TABELA_BUSCA):
+        _indice_disponivel = True
+    return bool(_indice_disponivel)
+
+
+def termo_fts(busca):
+    """Converte o texto digitado em uma consulta FTS5 com prefixo em cada palavra"""
+    palavras = re.findall(r'\w+', busca or '')
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def aplicar_busca(query, busca, empresa=None):
+    """Filtra a consulta (que já inclui User) pelos usuários que casam com a busca.
+
+    Retorna (query, relevancia): relevancia é a coluna de ordenação do FTS5
+    (menor é melhor) ou None quando a busca cai no ILIKE.
+    """
+    if not indice_disponivel():
+        colunas = [User.nome, User.email] + ([empresa] if empresa is not None else [])
+        return query.filter(or_(*[coluna.ilike(f'%{busca}%') for coluna in colunas])), None
+
+    termo = termo_fts(busca)
+    if not termo:
+        return query, None
+
+    resultados = db.select(
+        _busca.c.rowid.label('user_id'),
+        _busca.c.rank.label('relevancia')
+    ).where(literal_column(TABELA_BUSCA).op('MATCH')(termo)).subquery()
+
+    query = query.join(resultados, resultados.c.user_id == User.id)
+    return query, resultados.c.relevancia
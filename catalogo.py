@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+from src.models.user import db, User, Cliente, Fornecedor, BeneficioFornecedor, NIVEIS_PARCERIA
+from src.utils.respostas_http import etag_do_conteudo
+
+# Idade máxima do catálogo: cobre escritas feitas por outros processos
+CATALOGO_TTL = float(os.environ.get('BENEFICIOS_CATALOGO_TTL', '60'))
+
+
+class CatalogoBeneficios:
+    """Benefícios ativos de fornecedores liberados, pré-agrupados por nível de parceria.
+
+    Para cada nível guarda a lista acessível a ele já serializada em JSON, de
+    modo que atender um cliente é só uma consulta ao dicionário.
+    """
+
+    def __init__(self, linhas):
+        self.gerado_em = time.monotonic()
+        self._por_nivel = {}
+        for nivel in NIVEIS_PARCERIA:
+            permitidos = Cliente.niveis_beneficio_permitidos(nivel)
+            itens = [item for nivel_minimo, item in linhas if nivel_minimo in permitidos]
+            corpo = json.dumps(itens)
+            self._por_nivel[nivel] = (len(itens), corpo, etag_do_conteudo(corpo.encode()))
+
+    def _entrada(self, nivel):
+        return self._por_nivel.get(nivel) or self._por_nivel['inicial']
+
+    def total(self, nivel):
+        return self._entrada(nivel)[0]
+
+    def json(self, nivel):
+        return self._entrada(nivel)[1]
+
+    def etag(self, nivel):
+        """ETag do conteúdo do nível, igual entre processos com o mesmo catálogo"""
+        return f'beneficios-{nivel}-{self._entrada(nivel)[2]}'
+
+
+def _carregar_linhas():
+    beneficios = db.session.query(BeneficioFornecedor, Fornecedor, User).join(
+        Fornecedor, BeneficioFornecedor.fornecedor_id == Fornecedor.id
+    ).join(
+        User, Fornecedor.user_id == User.id
+    ).filter(
+        User.aprovado == True,
+        User.ativo == True,
+        BeneficioFornecedor.ativo == True,
+        BeneficioFornecedor.nivel_minimo.in_(NIVEIS_PARCERIA)
+    ).order_by(BeneficioFornecedor.id).all()
+
+    return [
+        (beneficio.nivel_minimo, {
+            'beneficio': beneficio.to_dict(),
+            'fornecedor': {
+                'id': fornecedor.id,
+                'nome_empresa': fornecedor.nome_empresa,
+                'categoria': fornecedor.categoria,
+                'telefone': user.telefone,
+                'instagram': fornecedor.instagram,
+                'site': fornecedor.site
+            }
+        })
+        for beneficio, fornecedor, user in beneficios
+    ]
+
+
+_catalogo = None
+_desatualizado = True
+_lock = threading.Lock()
+
+
+def invalidar_catalogo():
+    """Marca o catálogo para reconstrução (benefício alterado ou fornecedor aprovado/desativado)"""
+    global _desatualizado
+    _desatualizado = True
+
+
+def obter_catalogo():
+    """Catálogo vigente, reconstruído sob demanda após invalidação ou TTL"""
+    global _catalogo, _desatualizado
+    catalogo = _catalogo
+    if catalogo is not None and not _desatualizado and time.monotonic() - catalogo.gerado_em < CATALOGO_TTL:
+        return catalogo
+
+    with _lock:
+        catalogo = _catalogo
+        if catalogo is None or _desatualizado or time.monotonic() - catalogo.gerado_em >= CATALOGO_TTL:
+            # Desmarca antes de ler para não perder uma invalidação concorrente
+            _desatualizado = False
+            try:
+                catalogo = CatalogoBeneficios(_carregar_linhas())
+            except Exception:
+                _desatualizado = True
+                raise
+            _catalogo = catalogo
+        return catalogo
@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, User, Cliente, Pedido, TransacaoCashback, Fornecedor, BeneficioFornecedor
-from src.routes.auth import token_required
+from flask import Blueprint, request, jsonify, Response
+from src.models.user import db, Cliente, Pedido, TransacaoCashback, ResumoMensalCliente, filtro_mes, filtro_ano
+from src.routes.auth import token_required, invalidar_usuario
+from src.utils.paginacao import paginar_por_cursor, limitar_por_pagina
+from src.utils.paineis import invalidar_paineis
+from src.utils.relatorios import reagregar_dias_cubo
+from src.utils.catalogo import obter_catalogo
+from src.utils.serializacao import serializador
+from src.utils.respostas_http import nao_modificado
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+import json
 
 cliente_bp = Blueprint('cliente', __name__)
 
@@ -21,23 +27,27 @@ def get_dashboard(current_user):
         mes_atual = datetime.now().month
         ano_atual = datetime.now().year
         
-        # Total de pedidos do mês
-        pedidos_mes = Pedido.query.filter(
-            Pedido.cliente_id == cliente.id,
-            extract('month', Pedido.data_pedido) == mes_atual,
-            extract('year', Pedido.data_pedido) == ano_atual
-        ).all()
+        # Totais do mês a partir do resumo mensal, em uma única consulta
+        filtro_resumo = db.and_(
+            ResumoMensalCliente.cliente_id == cliente.id,
+            ResumoMensalCliente.ano == ano_atual,
+            ResumoMensalCliente.mes == mes_atual
+        )
         
-        total_kg_mes = sum(p.quantidade_kg for p in pedidos_mes)
-        total_valor_mes = sum(p.valor_total for p in pedidos_mes)
+        resumo = db.session.query(
+            ResumoMensalCliente.total_kg,
+            ResumoMensalCliente.total_valor,
+            ResumoMensalCliente.numero_pedidos
+        ).filter(filtro_resumo).first()
         
-        # Atualizar nível de parceria baseado no volume mensal
-        nivel_anterior = cliente.nivel_parceria
-        cliente.total_compras_mes = total_kg_mes
-        cliente.nivel_parceria = cliente.calcular_nivel_parceria()
+        total_kg_mes, total_valor_mes, numero_pedidos_mes = resumo or (0, 0, 0)
         
-        # Se mudou de nível, registrar
-        mudou_nivel = nivel_anterior != cliente.nivel_parceria
+        # Nível vigente pelo volume do mês (mesma regra de Cliente.niveis_vigentes);
+        # a gravação do nível fica com os pedidos
+        nivel_atual = Cliente.nivel_para_volume(total_kg_mes)
+        mudou_nivel = nivel_atual != cliente.nivel_parceria
+        
+        beneficios_disponiveis = obter_catalogo().total(nivel_atual)
         
         # Próximas entregas automáticas
         proximas_entregas = Pedido.query.filter(
@@ -51,51 +61,25 @@ def get_dashboard(current_user):
             TransacaoCashback.cliente_id == cliente.id
         ).order_by(TransacaoCashback.data_transacao.desc()).limit(5).all()
         
-        # Benefícios disponíveis baseados no nível
-        beneficios_disponiveis = BeneficioFornecedor.query.join(Fornecedor).join(User).filter(
-            User.aprovado == True,
-            User.ativo == True,
-            BeneficioFornecedor.ativo == True,
-            BeneficioFornecedor.nivel_minimo.in_(['inicial', cliente.nivel_parceria])
-        ).all()
-        
-        if cliente.nivel_parceria == 'avancado':
-            beneficios_disponiveis.extend(
-                BeneficioFornecedor.query.join(Fornecedor).join(User).filter(
-                    User.aprovado == True,
-                    User.ativo == True,
-                    BeneficioFornecedor.ativo == True,
-                    BeneficioFornecedor.nivel_minimo == 'avancado'
-                ).all()
-            )
-        elif cliente.nivel_parceria == 'elite':
-            beneficios_disponiveis.extend(
-                BeneficioFornecedor.query.join(Fornecedor).join(User).filter(
-                    User.aprovado == True,
-                    User.ativo == True,
-                    BeneficioFornecedor.ativo == True,
-                    BeneficioFornecedor.nivel_minimo.in_(['avancado', 'elite'])
-                ).all()
-            )
-        
-        db.session.commit()
+        dados_cliente = cliente.to_dict()
+        dados_cliente['nivel_parceria'] = nivel_atual
+        dados_cliente['total_compras_mes'] = total_kg_mes
         
         return jsonify({
-            'cliente': cliente.to_dict(),
+            'cliente': dados_cliente,
             'estatisticas_mes': {
                 'total_kg': total_kg_mes,
                 'total_valor': total_valor_mes,
-                'numero_pedidos': len(pedidos_mes),
+                'numero_pedidos': numero_pedidos_mes,
                 'mudou_nivel': mudou_nivel
             },
             'proximas_entregas': [p.to_dict() for p in proximas_entregas],
             'ultimas_transacoes_cashback': [t.to_dict() for t in ultimas_transacoes],
-            'beneficios_disponiveis': len(beneficios_disponiveis),
-            'taxa_cashback_atual': cliente.get_taxa_cashback()
+            'beneficios_disponiveis': beneficios_disponiveis,
+            'taxa_cashback_atual': Cliente.taxa_cashback_para_nivel(nivel_atual)
         }), 200
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @cliente_bp.route('/historico-pedidos', methods=['GET'])
@@ -123,25 +107,38 @@ def get_historico_pedidos(current_user):
         if status:
             query = query.filter(Pedido.status == status)
         if mes and ano:
-            query = query.filter(
-                extract('month', Pedido.data_pedido) == mes,
-                extract('year', Pedido.data_pedido) == ano
-            )
+            query = query.filter(filtro_mes(Pedido.data_pedido, ano, mes))
         elif ano:
-            query = query.filter(extract('year', Pedido.data_pedido) == ano)
-        
-        pedidos = query.order_by(Pedido.data_pedido.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+            query = query.filter(filtro_ano(Pedido.data_pedido, ano))
+        
+        # Modo cursor (opcional): páginas por keyset, sem COUNT
+        if 'after' in request.args:
+            per_page = limitar_por_pagina(per_page)
+            itens, next_cursor = paginar_por_cursor(
+                query, [Pedido.data_pedido, Pedido.id], request.args.get('after'), per_page,
+                chave=lambda p: (p.data_pedido, p.id)
+            )
+            paginacao = {'next_cursor': next_cursor, 'per_page': per_page}
+        else:
+            pedidos = query.order_by(Pedido.data_pedido.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            itens = pedidos.items
+            paginacao = {
+                'total': pedidos.total,
+                'pages': pedidos.pages,
+                'current_page': page,
+                'per_page': per_page
+            }
         
+        serializar = serializador(Pedido)
         return jsonify({
-            'pedidos': [p.to_dict() for p in pedidos.items],
-            'total': pedidos.total,
-            'pages': pedidos.pages,
-            'current_page': page,
-            'per_page': per_page
+            'pedidos': [serializar(p) for p in itens],
+            **paginacao
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -168,34 +165,39 @@ def get_historico_cashback(current_user):
         if tipo:
             query = query.filter(TransacaoCashback.tipo == tipo)
         
-        transacoes = query.order_by(TransacaoCashback.data_transacao.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        # Resumo do cashback
-        total_ganho = db.session.query(func.sum(TransacaoCashback.valor)).filter(
-            TransacaoCashback.cliente_id == cliente.id,
-            TransacaoCashback.tipo == 'ganho'
-        ).scalar() or 0
-        
-        total_usado = db.session.query(func.sum(TransacaoCashback.valor)).filter(
-            TransacaoCashback.cliente_id == cliente.id,
-            TransacaoCashback.tipo == 'uso'
-        ).scalar() or 0
+        # Modo cursor (opcional): páginas por keyset, sem COUNT
+        if 'after' in request.args:
+            per_page = limitar_por_pagina(per_page)
+            itens, next_cursor = paginar_por_cursor(
+                query, [TransacaoCashback.data_transacao, TransacaoCashback.id], request.args.get('after'), per_page,
+                chave=lambda t: (t.data_transacao, t.id)
+            )
+            paginacao = {'next_cursor': next_cursor, 'per_page': per_page}
+        else:
+            transacoes = query.order_by(TransacaoCashback.data_transacao.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            itens = transacoes.items
+            paginacao = {
+                'total': transacoes.total,
+                'pages': transacoes.pages,
+                'current_page': page,
+                'per_page': per_page
+            }
         
+        serializar = serializador(TransacaoCashback)
         return jsonify({
-            'transacoes': [t.to_dict() for t in transacoes.items],
-            'total': transacoes.total,
-            'pages': transacoes.pages,
-            'current_page': page,
-            'per_page': per_page,
+            'transacoes': [serializar(t) for t in itens],
+            **paginacao,
             'resumo': {
-                'total_ganho': total_ganho,
-                'total_usado': total_usado,
+                'total_ganho': cliente.cashback_total_ganho,
+                'total_usado': cliente.cashback_total_usado,
                 'saldo_atual': cliente.cashback_acumulado
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -260,12 +262,16 @@ def criar_pedido(current_user):
                         except ValueError:
                             pedido.data_entrega = hoje.replace(month=hoje.month + 1, day=28)
         
+        # Taxa pelo nível vigente (volume do mês antes deste pedido), como no dashboard
+        taxa_cashback = cliente.get_taxa_cashback()
+        valor_cashback = data['valor_total'] * taxa_cashback
+        
         db.session.add(pedido)
         db.session.flush()
         
-        # Calcular e adicionar cashback
-        taxa_cashback = cliente.get_taxa_cashback()
-        valor_cashback = data['valor_total'] * taxa_cashback
+        # Atualizar resumo mensal e cubo de vendas na mesma transação
+        ResumoMensalCliente.registrar_pedido(pedido)
+        reagregar_dias_cubo([pedido.data_pedido])
         
         transacao_cashback = TransacaoCashback(
             cliente_id=cliente.id,
@@ -275,11 +281,16 @@ def criar_pedido(current_user):
             descricao=f'Cashback do pedido #{pedido.id}'
         )
         
-        cliente.cashback_acumulado += valor_cashback
+        Cliente.creditar_cashback(cliente.id, valor_cashback)
         cliente.data_ultima_compra = datetime.utcnow()
         
+        # Persistir o nível de parceria com o volume do mês já incluindo este pedido
+        cliente.atualizar_nivel_parceria(pedido.data_pedido.year, pedido.data_pedido.month)
+        
         db.session.add(transacao_cashback)
         db.session.commit()
+        invalidar_usuario(current_user.id)
+        invalidar_paineis()
         
         return jsonify({
             'message': 'Pedido criado com sucesso',
@@ -308,7 +319,9 @@ def usar_cashback(current_user):
         if valor_uso <= 0:
             return jsonify({'message': 'Valor deve ser maior que zero'}), 400
         
-        if valor_uso > cliente.cashback_acumulado:
+        # Débito condicional e atômico: não há leitura do saldo em Python
+        if not Cliente.debitar_cashback(cliente.id, valor_uso):
+            db.session.rollback()
             return jsonify({'message': 'Saldo insuficiente'}), 400
         
         # Registrar uso do cashback
@@ -319,10 +332,10 @@ def usar_cashback(current_user):
             descricao=data.get('descricao', 'Uso de cashback')
         )
         
-        cliente.cashback_acumulado -= valor_uso
-        
         db.session.add(transacao)
         db.session.commit()
+        invalidar_usuario(current_user.id)
+        invalidar_paineis()
         
         return jsonify({
             'message': 'Cashback utilizado com sucesso',
@@ -345,43 +358,25 @@ def get_beneficios_disponiveis(current_user):
         if not cliente:
             return jsonify({'message': 'Perfil de cliente não encontrado'}), 404
         
-        # Benefícios baseados no nível do cliente
-        niveis_permitidos = ['inicial']
-        if cliente.nivel_parceria in ['avancado', 'elite']:
-            niveis_permitidos.append('avancado')
-        if cliente.nivel_parceria == 'elite':
-            niveis_permitidos.append('elite')
-        
-        beneficios = db.session.query(BeneficioFornecedor, Fornecedor, User).join(
-            Fornecedor, BeneficioFornecedor.fornecedor_id == Fornecedor.id
-        ).join(
-            User, Fornecedor.user_id == User.id
-        ).filter(
-            User.aprovado == True,
-            User.ativo == True,
-            BeneficioFornecedor.ativo == True,
-            BeneficioFornecedor.nivel_minimo.in_(niveis_permitidos)
-        ).all()
-        
-        resultado = []
-        for beneficio, fornecedor, user in beneficios:
-            resultado.append({
-                'beneficio': beneficio.to_dict(),
-                'fornecedor': {
-                    'id': fornecedor.id,
-                    'nome_empresa': fornecedor.nome_empresa,
-                    'categoria': fornecedor.categoria,
-                    'telefone': user.telefone,
-                    'instagram': fornecedor.instagram,
-                    'site': fornecedor.site
-                }
-            })
-        
-        return jsonify({
-            'beneficios': resultado,
-            'nivel_cliente': cliente.nivel_parceria,
-            'total_beneficios': len(resultado)
-        }), 200
+        # Nível vigente pelo volume do mês, o mesmo exibido no dashboard
+        nivel = cliente.nivel_vigente()
+        
+        # Benefícios do nível já serializados pelo catálogo em memória
+        catalogo = obter_catalogo()
+        etag = catalogo.etag(nivel)
+        resposta = nao_modificado(etag)
+        if resposta:
+            return resposta
+        
+        # O corpo depende só do conteúdo do nível, o mesmo que gera a ETag
+        corpo = '{"beneficios": %s, "nivel_cliente": %s, "total_beneficios": %d}' % (
+            catalogo.json(nivel),
+            json.dumps(nivel),
+            catalogo.total(nivel)
+        )
+        resposta = Response(corpo, status=200, mimetype='application/json')
+        resposta.set_etag(etag, weak=True)
+        return resposta
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
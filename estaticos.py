@@ -0,0 +1,111 @@
+import gzip
+import mimetypes
+import os
+import re
+import threading
+import time
+from flask import Response, request, send_file
+
+# Arquivos gerados pelo Vite com hash no nome (ex.: assets/index-4f1c2a9b.js)
+PADRAO_ASSET_HASH = re.compile(r'(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+
+# Variantes pré-comprimidas, em ordem de preferência
+VARIANTES = [('br', '.br'), ('gzip', '.gz')]
+
+
+class Arquivo:
+    def __init__(self, caminho, relativo):
+        self.caminho = caminho
+        self.mimetype = mimetypes.guess_type(relativo)[0] or 'application/octet-stream'
+        self.imutavel = bool(PADRAO_ASSET_HASH.search(relativo))
+        self.variantes = {
+            codificacao: caminho + sufixo
+            for codificacao, sufixo in VARIANTES
+            if os.path.isfile(caminho + sufixo)
+        }
+
+
+class IndiceEstaticos:
+    """Índice em memória da pasta estática, montado uma vez (ou a cada intervalo).
+
+    Evita consultar o disco a cada requisição, escolhe a variante .br/.gz aceita
+    pelo cliente e mantém o index.html (e sua versão gzip) em memória para as
+    rotas do SPA.
+    """
+
+    def __init__(self, pasta, intervalo=None):
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._carregado_em = None
+        self.arquivos = {}
+        self.index = None
+        self.index_gzip = None
+        self.index_etag = None
+
+    def carregar(self):
+        arquivos = {}
+        if self.pasta and os.path.isdir(self.pasta):
+            for raiz, _, nomes in os.walk(self.pasta):
+                for nome in nomes:
+                    caminho = os.path.join(raiz, nome)
+                    relativo = os.path.relpath(caminho, self.pasta).replace(os.sep, '/')
+                    arquivos[relativo] = Arquivo(caminho, relativo)
+
+        index = gzip_index = etag = None
+        if 'index.html' in arquivos:
+            with open(arquivos['index.html'].caminho, 'rb') as arquivo:
+                index = arquivo.read()
+            gzip_index = gzip.compress(index)
+            etag = f'{os.path.getmtime(arquivos["index.html"].caminho):.0f}-{len(index)}'
+
+        self.arquivos, self.index, self.index_gzip, self.index_etag = arquivos, index, gzip_index, etag
+        self._carregado_em = time.monotonic()
+
+    def _atualizar(self):
+        if self._carregado_em is None or (
+            self.intervalo and time.monotonic() - self._carregado_em >= self.intervalo
+        ):
+            with self._lock:
+                if self._carregado_em is None or (
+                    self.intervalo and time.monotonic() - self._carregado_em >= self.intervalo
+                ):
+                    self.carregar()
+
+    def servir(self, path):
+        """Resposta para o caminho pedido; cai no index.html para rotas do SPA"""
+        self._atualizar()
+
+        arquivo = self.arquivos.get(path) if path else None
+        if arquivo is None:
+            return self._servir_index()
+
+        codificacao = next(
+            (c for c, _ in VARIANTES if c in arquivo.variantes and request.accept_encodings[c] > 0),
+            None
+        )
+        caminho = arquivo.variantes[codificacao] if codificacao else arquivo.caminho
+
+        resposta = send_file(caminho, mimetype=arquivo.mimetype, conditional=True)
+        if codificacao:
+            resposta.headers['Content-Encoding'] = codificacao
+        if arquivo.variantes:
+            resposta.vary.add('Accept-Encoding')
+        resposta.headers['Cache-Control'] = CACHE_IMUTAVEL if arquivo.imutavel else CACHE_REVALIDAR
+        return resposta
+
+    def _servir_index(self):
+        if self.index is None:
+            return "index.html not found", 404
+
+        if request.accept_encodings['gzip'] > 0:
+            resposta = Response(self.index_gzip, mimetype='text/html')
+            resposta.headers['Content-Encoding'] = 'gzip'
+        else:
+            resposta = Response(self.index, mimetype='text/html')
+        resposta.vary.add('Accept-Encoding')
+        resposta.headers['Cache-Control'] = CACHE_REVALIDAR
+        resposta.set_etag(self.index_etag, weak=True)
+        return resposta.make_conditional(request)
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db, User, Cliente, Fornecedor, BeneficioFornecedor
 from src.routes.auth import token_required
-from sqlalchemy import or_
+from src.utils.paginacao import paginar_por_cursor, limitar_por_pagina
+from src.utils.paineis import clientes_por_nivel, estatisticas_clientes
+from src.utils.busca import aplicar_busca
+from src.utils.catalogo import invalidar_catalogo
+from src.utils.serializacao import Projecao
 
 fornecedor_bp = Blueprint('fornecedor', __name__)
 
@@ -16,30 +20,8 @@ def get_dashboard(current_user):
         if not fornecedor:
             return jsonify({'message': 'Perfil de fornecedor não encontrado'}), 404
         
-        # Total de clientes que podem acessar os benefícios
-        total_clientes = Cliente.query.join(User).filter(
-            User.ativo == True,
-            User.aprovado == True
-        ).count()
-        
-        # Clientes por nível
-        clientes_inicial = Cliente.query.join(User).filter(
-            User.ativo == True,
-            User.aprovado == True,
-            Cliente.nivel_parceria == 'inicial'
-        ).count()
-        
-        clientes_avancado = Cliente.query.join(User).filter(
-            User.ativo == True,
-            User.aprovado == True,
-            Cliente.nivel_parceria == 'avancado'
-        ).count()
-        
-        clientes_elite = Cliente.query.join(User).filter(
-            User.ativo == True,
-            User.aprovado == True,
-            Cliente.nivel_parceria == 'elite'
-        ).count()
+        # Contagens globais por nível, compartilhadas entre fornecedores
+        niveis = clientes_por_nivel()
         
         # Benefícios ativos do fornecedor
         beneficios_ativos = BeneficioFornecedor.query.filter(
@@ -47,22 +29,27 @@ def get_dashboard(current_user):
             BeneficioFornecedor.ativo == True
         ).count()
         
+        # ?fields=/?expand= reduzem o perfil; os benefícios só vêm com expand=beneficios
+        projecao = Projecao.da_requisicao(Fornecedor, request.args)
+        
         return jsonify({
-            'fornecedor': fornecedor.to_dict(),
+            'fornecedor': projecao.serializar(fornecedor) if projecao else fornecedor.to_dict(),
             'estatisticas': {
-                'total_clientes': total_clientes,
-                'clientes_inicial': clientes_inicial,
-                'clientes_avancado': clientes_avancado,
-                'clientes_elite': clientes_elite,
+                'total_clientes': sum(niveis.values()),
+                'clientes_inicial': niveis['inicial'],
+                'clientes_avancado': niveis['avancado'],
+                'clientes_elite': niveis['elite'],
                 'beneficios_ativos': beneficios_ativos
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @fornecedor_bp.route('/clientes', methods=['GET'])
-@token_required
+@token_required(claims_only=True)
 def get_clientes(current_user):
     try:
         if current_user.tipo_usuario != 'fornecedor':
@@ -88,21 +75,35 @@ def get_clientes(current_user):
         if cidade:
             query = query.filter(Cliente.cidade.ilike(f'%{cidade}%'))
         
+        relevancia = None
         if busca:
-            query = query.filter(
-                or_(
-                    User.nome.ilike(f'%{busca}%'),
-                    Cliente.empresa.ilike(f'%{busca}%'),
-                    User.email.ilike(f'%{busca}%')
-                )
+            query, relevancia = aplicar_busca(query, busca, empresa=Cliente.empresa)
+        
+        # Modo cursor (opcional): páginas por keyset, sem COUNT
+        if 'after' in request.args:
+            per_page = limitar_por_pagina(per_page)
+            itens, next_cursor = paginar_por_cursor(
+                query, [User.nome, Cliente.id], request.args.get('after'), per_page,
+                chave=lambda linha: (linha[1].nome, linha[0].id),
+                descendente=False
             )
-        
-        clientes = query.order_by(User.nome).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+            paginacao = {'next_cursor': next_cursor, 'per_page': per_page}
+        else:
+            # Com busca, os resultados mais relevantes vêm primeiro
+            ordem = [User.nome] if relevancia is None else [relevancia, User.nome]
+            clientes = query.order_by(*ordem).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            itens = clientes.items
+            paginacao = {
+                'total': clientes.total,
+                'pages': clientes.pages,
+                'current_page': page,
+                'per_page': per_page
+            }
         
         resultado = []
-        for cliente, user in clientes.items:
+        for cliente, user in itens:
             # Não expor informações sensíveis
             resultado.append({
                 'id': cliente.id,
@@ -117,12 +118,11 @@ def get_clientes(current_user):
         
         return jsonify({
             'clientes': resultado,
-            'total': clientes.total,
-            'pages': clientes.pages,
-            'current_page': page,
-            'per_page': per_page
+            **paginacao
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -177,6 +177,7 @@ def criar_beneficio(current_user):
         
         db.session.add(beneficio)
         db.session.commit()
+        invalidar_catalogo()
         
         return jsonify({
             'message': 'Benefício criado com sucesso',
@@ -220,6 +221,7 @@ def atualizar_beneficio(current_user, beneficio_id):
             beneficio.ativo = data['ativo']
         
         db.session.commit()
+        invalidar_catalogo()
         
         return jsonify({
             'message': 'Benefício atualizado com sucesso',
@@ -251,6 +253,7 @@ def deletar_beneficio(current_user, beneficio_id):
         
         db.session.delete(beneficio)
         db.session.commit()
+        invalidar_catalogo()
         
         return jsonify({'message': 'Benefício removido com sucesso'}), 200
         
@@ -259,73 +262,13 @@ def deletar_beneficio(current_user, beneficio_id):
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @fornecedor_bp.route('/estatisticas-clientes', methods=['GET'])
-@token_required
+@token_required(claims_only=True)
 def get_estatisticas_clientes(current_user):
     try:
         if current_user.tipo_usuario != 'fornecedor':
             return jsonify({'message': 'Acesso negado'}), 403
         
-        # Distribuição por cidade
-        clientes_por_cidade = db.session.query(
-            Cliente.cidade,
-            db.func.count(Cliente.id).label('count')
-        ).join(
-            User, Cliente.user_id == User.id
-        ).filter(
-            User.ativo == True,
-            User.aprovado == True,
-            Cliente.cidade.isnot(None)
-        ).group_by(Cliente.cidade).order_by(db.func.count(Cliente.id).desc()).limit(10).all()
-        
-        # Distribuição por nível
-        clientes_por_nivel = db.session.query(
-            Cliente.nivel_parceria,
-            db.func.count(Cliente.id).label('count')
-        ).join(
-            User, Cliente.user_id == User.id
-        ).filter(
-            User.ativo == True,
-            User.aprovado == True
-        ).group_by(Cliente.nivel_parceria).all()
-        
-        # Clientes mais ativos (por data da última compra)
-        from datetime import datetime, timedelta
-        data_limite = datetime.now() - timedelta(days=30)
-        
-        clientes_ativos = db.session.query(
-            User.nome,
-            Cliente.empresa,
-            Cliente.cidade,
-            Cliente.nivel_parceria,
-            Cliente.data_ultima_compra
-        ).join(
-            User, Cliente.user_id == User.id
-        ).filter(
-            User.ativo == True,
-            User.aprovado == True,
-            Cliente.data_ultima_compra >= data_limite
-        ).order_by(Cliente.data_ultima_compra.desc()).limit(20).all()
-        
-        return jsonify({
-            'clientes_por_cidade': [
-                {'cidade': cidade, 'count': count}
-                for cidade, count in clientes_por_cidade
-            ],
-            'clientes_por_nivel': [
-                {'nivel': nivel, 'count': count}
-                for nivel, count in clientes_por_nivel
-            ],
-            'clientes_ativos_recentes': [
-                {
-                    'nome': nome,
-                    'empresa': empresa,
-                    'cidade': cidade,
-                    'nivel_parceria': nivel,
-                    'data_ultima_compra': data_ultima_compra.isoformat() if data_ultima_compra else None
-                }
-                for nome, empresa, cidade, nivel, data_ultima_compra in clientes_ativos
-            ]
-        }), 200
+        return jsonify(estatisticas_clientes()), 200
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -0,0 +1,50 @@
+"""Configuração do gunicorn para produção.
+
+O arquivo fica em src/, ao lado de main.py. Uso, na raiz do projeto
+(a pasta que contém src/): gunicorn -c src/gunicorn_conf.py
+Cada valor pode ser ajustado por variável de ambiente.
+"""
+import multiprocessing
+import os
+
+# src.main é importado como pacote: a pasta que contém src/ vai para o
+# sys.path, de modo que o comando funciona também fora da raiz
+pythonpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+wsgi_app = 'src.main:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+
+# Processos e threads por processo (gthread atende várias requisições por worker)
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+# Carrega a aplicação no mestre antes do fork: memória compartilhada copy-on-write
+preload_app = True
+
+# Recicla cada worker após N requisições (com jitter para não reiniciarem juntos)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Conexões abertas no mestre não podem ser compartilhadas entre processos;
+    # wsgi() devolve a aplicação já carregada pelo preload (ou a carrega aqui)
+    from src.models.user import db
+    from src.utils.saude import reiniciar_contadores
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    reiniciar_contadores()
+    server.log.info('Worker %s iniciado (pid %s)', worker.age, worker.pid)
+
+
+def worker_exit(server, worker):
+    server.log.info('Worker %s encerrado (pid %s)', worker.age, worker.pid)
@@ -0,0 +1,216 @@
+import csv
+import io
+import json
+from datetime import datetime
+from src.models.user import db, Cliente, Pedido, TransacaoCashback, ResumoMensalCliente
+from src.utils.relatorios import reagregar_dias_cubo
+
+CAMPOS_OBRIGATORIOS = ['cliente_id', 'quantidade_kg', 'valor_total', 'tipo_cafe', 'tipo_torra']
+MAX_ERROS_RELATORIO = 1000
+
+
+def ler_registros(fluxo, formato):
+    """Itera (linha, registro, erro) sobre um upload CSV ou NDJSON sem carregá-lo inteiro"""
+    if not isinstance(fluxo, io.BufferedIOBase):
+        fluxo = io.BufferedReader(fluxo)
+    texto = io.TextIOWrapper(fluxo, encoding='utf-8-sig', newline='')
+
+    if formato == 'csv':
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            yield leitor.line_num, registro, None
+        return
+
+    for numero, linha in enumerate(texto, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            yield numero, None, 'JSON inválido'
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, 'Cada linha deve ser um objeto JSON'
+            continue
+        yield numero, registro, None
+
+
+def _data(valor, campo):
+    if not valor:
+        return datetime.combine(datetime.now().date(), datetime.min.time())
+    try:
+        return datetime.strptime(str(valor), '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Campo {campo} deve estar no formato AAAA-MM-DD')
+
+
+def validar_registro(registro):
+    """Converte um registro do arquivo nos campos do pedido; ValueError se inválido"""
+    for campo in CAMPOS_OBRIGATORIOS:
+        if registro.get(campo) in (None, ''):
+            raise ValueError(f'Campo {campo} é obrigatório')
+
+    try:
+        cliente_id = int(registro['cliente_id'])
+        quantidade_kg = float(registro['quantidade_kg'])
+        valor_total = float(registro['valor_total'])
+    except (TypeError, ValueError):
+        raise ValueError('cliente_id, quantidade_kg e valor_total devem ser numéricos')
+
+    if quantidade_kg <= 0 or valor_total < 0:
+        raise ValueError('Quantidade deve ser maior que zero e valor não pode ser negativo')
+
+    return {
+        'cliente_id': cliente_id,
+        'quantidade_kg': quantidade_kg,
+        'tipo_cafe': str(registro['tipo_cafe']),
+        'tipo_torra': str(registro['tipo_torra']),
+        'valor_total': valor_total,
+        'status': 'entregue',
+        'data_pedido': _data(registro.get('data_pedido'), 'data_pedido'),
+        'data_entrega': _data(registro.get('data_entrega'), 'data_entrega'),
+        'observacoes': registro.get('observacoes') or 'Compra importada pelo administrador'
+    }
+
+
+class ImportadorCompras:
+    """Importa compras manuais em lotes, com um relatório de erros por linha.
+
+    Cada lote é gravado em uma transação: pedidos e transações de cashback via
+    executemany, resumo mensal e saldo de cashback agregados por cliente. O nível
+    de parceria é recalculado uma única vez por cliente ao final.
+    """
+
+    def __init__(self, tamanho_lote=1000):
+        self.tamanho_lote = tamanho_lote
+        self.importados = 0
+        self.total_erros = 0
+        self.erros = []
+        self._clientes = {}  # cliente_id -> (user_id, taxa de cashback)
+        self._meses_afetados = set()
+
+    def registrar_erro(self, linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATORIO:
+            self.erros.append({'linha': linha, 'mensagem': mensagem})
+
+    def processar(self, registros):
+        lote = []
+        for linha, registro, erro in registros:
+            if erro:
+                self.registrar_erro(linha, erro)
+                continue
+            try:
+                lote.append((linha, validar_registro(registro)))
+            except ValueError as e:
+                self.registrar_erro(linha, str(e))
+                continue
+
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(lote)
+                lote = []
+
+        if lote:
+            self._gravar_lote(lote)
+
+        self._atualizar_niveis()
+        return self.relatorio()
+
+    def _carregar_clientes(self, cliente_ids):
+        novos = [cid for cid in cliente_ids if cid not in self._clientes]
+        if not novos:
+            return
+        niveis = Cliente.niveis_vigentes(novos)
+        for cliente_id, user_id in db.session.query(Cliente.id, Cliente.user_id).filter(Cliente.id.in_(novos)):
+            self._clientes[cliente_id] = (user_id, Cliente.taxa_cashback_para_nivel(niveis[cliente_id]))
+
+    def _gravar_lote(self, lote):
+        self._carregar_clientes({pedido['cliente_id'] for _, pedido in lote})
+
+        pedidos = []
+        for linha, pedido in lote:
+            if pedido['cliente_id'] not in self._clientes:
+                self.registrar_erro(linha, 'Cliente não encontrado')
+            else:
+                pedidos.append(pedido)
+        if not pedidos:
+            return
+
+        try:
+            ids = db.session.scalars(
+                db.insert(Pedido).returning(Pedido.id, sort_by_parameter_order=True),
+                pedidos
+            ).all()
+
+            transacoes = []
+            resumos = {}
+            cashback = {}
+            ultima_compra = {}
+            for pedido_id, pedido in zip(ids, pedidos):
+                cliente_id = pedido['cliente_id']
+                data_pedido = pedido['data_pedido']
+                valor_cashback = pedido['valor_total'] * self._clientes[cliente_id][1]
+
+                transacoes.append({
+                    'cliente_id': cliente_id,
+                    'pedido_id': pedido_id,
+                    'tipo': 'ganho',
+                    'valor': valor_cashback,
+                    'descricao': f'Cashback da compra importada #{pedido_id}'
+                })
+
+                chave = (cliente_id, data_pedido.year, data_pedido.month)
+                kg, valor, quantidade = resumos.get(chave, (0, 0, 0))
+                resumos[chave] = (kg + pedido['quantidade_kg'], valor + pedido['valor_total'], quantidade + 1)
+
+                cashback[cliente_id] = cashback.get(cliente_id, 0) + valor_cashback
+                if data_pedido > ultima_compra.get(cliente_id, datetime.min):
+                    ultima_compra[cliente_id] = data_pedido
+
+            db.session.execute(db.insert(TransacaoCashback), transacoes)
+
+            for (cliente_id, ano, mes), (kg, valor, quantidade) in resumos.items():
+                ResumoMensalCliente.registrar(cliente_id, datetime(ano, mes, 1), kg, valor, quantidade)
+                self._meses_afetados.add((cliente_id, ano, mes))
+
+            reagregar_dias_cubo({pedido['data_pedido'] for pedido in pedidos})
+
+            for cliente_id, valor_cashback in cashback.items():
+                Cliente.creditar_cashback(cliente_id, valor_cashback)
+                Cliente.query.filter(
+                    Cliente.id == cliente_id,
+                    db.or_(Cliente.data_ultima_compra.is_(None), Cliente.data_ultima_compra < ultima_compra[cliente_id])
+                ).update({Cliente.data_ultima_compra: ultima_compra[cliente_id]}, synchronize_session=False)
+
+            db.session.commit()
+            self.importados += len(pedidos)
+        except Exception as e:
+            db.session.rollback()
+            for linha, pedido in lote:
+                if pedido['cliente_id'] in self._clientes:
+                    self.registrar_erro(linha, f'Erro ao gravar lote: {str(e)}')
+
+    def _atualizar_niveis(self):
+        """Recalcula o nível dos clientes cujo mês corrente recebeu compras"""
+        agora = datetime.now()
+        clientes = {
+            cliente_id for cliente_id, ano, mes in self._meses_afetados
+            if (ano, mes) == (agora.year, agora.month)
+        }
+        if not clientes:
+            return
+        for cliente in Cliente.query.filter(Cliente.id.in_(clientes)):
+            cliente.atualizar_nivel_parceria(agora.year, agora.month)
+        db.session.commit()
+
+    def usuarios_afetados(self):
+        return {user_id for user_id, _ in self._clientes.values()}
+
+    def relatorio(self):
+        return {
+            'importados': self.importados,
+            'total_erros': self.total_erros,
+            'erros': self.erros,
+            'erros_truncados': self.total_erros > len(self.erros)
+        }
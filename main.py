@@ -1,40 +1,75 @@
 import os
 import sys
+from importlib import import_module
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.cliente import cliente_bp
-from src.routes.admin import admin_bp
-from src.routes.fornecedor import fornecedor_bp
-from src.routes.password_reset import password_reset_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Configurar CORS
-CORS(app, origins="*")
-
-# Registrar blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(cliente_bp, url_prefix='/api/cliente')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-app.register_blueprint(fornecedor_bp, url_prefix='/api/fornecedor')
-app.register_blueprint(password_reset_bp, url_prefix='/api/auth')
-
-# Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Criar tabelas e dados iniciais
-with app.app_context():
+
+BLUEPRINTS = [
+    ('src.routes.user', 'user_bp', '/api'),
+    ('src.routes.auth', 'auth_bp', '/api/auth'),
+    ('src.routes.cliente', 'cliente_bp', '/api/cliente'),
+    ('src.routes.admin', 'admin_bp', '/api/admin'),
+    ('src.routes.fornecedor', 'fornecedor_bp', '/api/fornecedor'),
+    ('src.routes.password_reset', 'password_reset_bp', '/api/auth')
+]
+
+
+def inicializar_banco():
+    """Cria as tabelas, aplica as migrações simples e cadastra os dados iniciais"""
     db.create_all()
+
+    # Adicionar colunas novas em bancos criados antes delas
+    colunas_novas = {
+        'user': {'token_version': 'INTEGER NOT NULL DEFAULT 0'},
+        'pedido': {'data_atualizacao': 'DATETIME'},
+        'cliente': {
+            'cashback_total_ganho': 'FLOAT NOT NULL DEFAULT 0',
+            'cashback_total_usado': 'FLOAT NOT NULL DEFAULT 0'
+        }
+    }
+    adicionadas = set()
+    for tabela, colunas in colunas_novas.items():
+        existentes = [c['name'] for c in db.inspect(db.engine).get_columns(tabela)]
+        for coluna, definicao in colunas.items():
+            if coluna not in existentes:
+                with db.engine.begin() as conexao:
+                    conexao.execute(db.text(f'ALTER TABLE "{tabela}" ADD COLUMN {coluna} {definicao}'))
+                adicionadas.add((tabela, coluna))
+
+    # Popular os contadores de cashback a partir do extrato
+    if ('cliente', 'cashback_total_ganho') in adicionadas:
+        from src.models.user import reconciliar_cashback
+        reconciliar_cashback(corrigir=True)
+        db.session.commit()
+
+    # Garantir índices em bancos criados antes da sua definição
+    from src.models.user import Pedido
+    for indice in Pedido.__table__.indexes:
+        indice.create(db.engine, checkfirst=True)
+
+    # Índice de busca textual de usuários (FTS5), mantido por triggers
+    from src.utils.busca import criar_indice_busca
+    criar_indice_busca()
+
+    # Popular o resumo mensal a partir do histórico de pedidos, se ainda vazio
+    from src.models.user import ResumoMensalCliente
+    if not ResumoMensalCliente.query.first() and Pedido.query.first():
+        ResumoMensalCliente.reconstruir()
+        db.session.commit()
+
+    # Cubo de vendas diário: montado por inteiro na primeira vez e, depois,
+    # reagregando os dias com pedidos alterados fora das rotas
+    from src.utils.relatorios import atualizar_cubo_vendas
+    atualizar_cubo_vendas()
+
+    # Nível de parceria gravado conforme o mês corrente (virada de mês)
+    from src.models.user import Cliente
+    Cliente.recalcular_niveis()
+    db.session.commit()
     
     # Criar usuário admin padrão se não existir
     from src.models.user import User
@@ -50,22 +85,91 @@ with app.app_context():
         db.session.commit()
         print("Usuário admin criado: admin@cafemaiolini.com / admin123")
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+
+def create_app(config=None):
+    """Cria a aplicação sem tocar no banco; o schema fica com `flask inicializar-banco`"""
+    from src.utils.provedor_json import ProvedorJSON
+    from src.utils.respostas_http import registrar_respostas_http
+    from src.utils.estaticos import IndiceEstaticos
+    from src.utils.saude import registrar_saude
+    from src.utils.perfil_sqlite import aplicar_pragmas, pragmas_do_ambiente
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.json = ProvedorJSON(app)
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # Configuração do banco de dados
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if config:
+        app.config.from_mapping(config)
+
+    # Configurar CORS
+    CORS(app, origins="*")
+
+    # ETag/304 e compressão das respostas JSON
+    registrar_respostas_http(app)
+
+    # Registrar blueprints (módulos importados só aqui, ao criar a aplicação)
+    for modulo, nome, prefixo in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(modulo), nome), url_prefix=prefixo)
+
+    db.init_app(app)
+
+    # Pragmas de desempenho do SQLite em cada conexão: perfil SQLITE_PROFILE
+    # ou o dicionário SQLITE_PRAGMAS passado na configuração
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    with app.app_context():
+        aplicar_pragmas(db.engine, pragmas_do_ambiente() if pragmas is None else pragmas)
+
+    # Estado por worker em /api/saude
+    registrar_saude(app)
+
+    @app.cli.command('inicializar-banco')
+    def inicializar_banco_command():
+        """Cria o schema, aplica migrações e cadastra o admin padrão"""
+        inicializar_banco()
+        print("Banco de dados inicializado")
+
+    @app.cli.command('recalcular-niveis-parceria')
+    def recalcular_niveis_parceria_command():
+        """Regrava o nível de parceria pelo volume do mês; agendar no dia 1 (cron)"""
+        from src.models.user import Cliente
+        total = Cliente.recalcular_niveis()
+        db.session.commit()
+        print(f"Nível de parceria recalculado para {total} clientes")
+
+    @app.cli.command('reconstruir-cubo-vendas')
+    def reconstruir_cubo_vendas_command():
+        """Recria o cubo de vendas diário a partir de todos os pedidos"""
+        from src.utils.relatorios import reconstruir_cubo_vendas
+        reconstruir_cubo_vendas()
+        print("Cubo de vendas reconstruído")
+
+    # Índice da pasta estática, montado na primeira requisição;
+    # STATIC_RESCAN_INTERVAL (s) refaz a varredura
+    indice_estaticos = IndiceEstaticos(
+        app.static_folder,
+        intervalo=float(os.environ.get('STATIC_RESCAN_INTERVAL', '0')) or None
+    )
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+        return indice_estaticos.servir(path)
+
+    return app
+
 
+# Sem instância no nível do módulo: importar src.main não cria a aplicação.
+# `flask --app src.main` e o gunicorn (src.main:create_app()) chamam a fábrica.
 
+# Servidor de desenvolvimento; em produção, na raiz do projeto: gunicorn -c src/gunicorn_conf.py
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        inicializar_banco()
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, and_, or_
+
+# Limite de itens por página no modo cursor
+MAX_POR_PAGINA = 100
+
+
+def limitar_por_pagina(per_page):
+    """Mantém per_page entre 1 e MAX_POR_PAGINA"""
+    return max(1, min(per_page, MAX_POR_PAGINA))
+
+
+def codificar_cursor(valores):
+    """Serializa os valores da chave de ordenação em um cursor opaco"""
+    dados = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, colunas):
+    """Converte o cursor opaco de volta nos valores da chave; ValueError se inválido"""
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+
+    if not isinstance(dados, list) or len(dados) != len(colunas):
+        raise ValueError('Cursor inválido')
+
+    valores = []
+    for coluna, valor in zip(colunas, dados):
+        try:
+            if isinstance(valor, (list, dict)):
+                raise TypeError(valor)
+            if valor is not None and isinstance(coluna.type, DateTime):
+                valor = datetime.fromisoformat(valor)
+        except (ValueError, TypeError):
+            raise ValueError('Cursor inválido')
+        valores.append(valor)
+    return valores
+
+
+def _depois_de(colunas, valores, descendente):
+    """Condição de keyset: linhas estritamente após (valores) na ordem dada"""
+    condicoes = []
+    for i, (coluna, valor) in enumerate(zip(colunas, valores)):
+        iguais = [c == v for c, v in zip(colunas[:i], valores[:i])]
+        passo = coluna < valor if descendente else coluna > valor
+        condicoes.append(and_(*iguais, passo))
+    return or_(*condicoes)
+
+
+def paginar_por_cursor(query, colunas, after, per_page, chave, descendente=True):
+    """Pagina por keyset sobre as colunas (a última deve ser única, ex.: id).
+
+    `after` é o cursor recebido (vazio para a primeira página) e `chave` extrai
+    de cada linha os valores das colunas. Retorna (itens, next_cursor), sem COUNT.
+    """
+    per_page = limitar_por_pagina(per_page)
+    if after:
+        query = query.filter(_depois_de(colunas, decodificar_cursor(after, colunas), descendente))
+
+    ordem = [c.desc() if descendente else c.asc() for c in colunas]
+    linhas = query.order_by(*ordem).limit(per_page + 1).all()
+
+    itens = linhas[:per_page]
+    next_cursor = None
+    if len(linhas) > per_page and itens:
+        next_cursor = codificar_cursor(chave(itens[-1]))
+    return itens, next_cursor
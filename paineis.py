@@ -0,0 +1,165 @@
+import os
+from src.models.user import db, User, Cliente, Fornecedor, Pedido, VendaDiaria, NIVEIS_PARCERIA, filtro_mes
+from src.utils.cache import CacheTTL
+from datetime import datetime, timedelta
+
+# Painéis agregados compartilhados entre requisições; as escritas relevantes
+# invalidam o cache e o TTL curto cobre alterações feitas fora das rotas
+_cache_paineis = CacheTTL(
+    maxsize=64,
+    ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', '15'))
+)
+
+
+def invalidar_paineis():
+    """Descarta os painéis em cache após escritas em pedidos, usuários ou aprovações"""
+    _cache_paineis.clear()
+
+
+def _em_cache(chave, calcular):
+    valor = _cache_paineis.get(chave)
+    if valor is None:
+        valor = calcular()
+        _cache_paineis.set(chave, valor)
+    return valor
+
+
+def _calcular_dashboard_admin():
+    agora = datetime.now()
+
+    # Os três agregados do mês saem do cubo de vendas diário, que as rotas de
+    # pedidos mantêm na mesma transação (pedidos de todos os status)
+    mes = db.select(
+        db.func.coalesce(db.func.sum(VendaDiaria.quantidade), 0).label('pedidos'),
+        db.func.coalesce(db.func.sum(VendaDiaria.faturamento), 0).label('faturamento'),
+        db.func.coalesce(db.func.sum(VendaDiaria.volume), 0).label('volume')
+    ).where(filtro_mes(VendaDiaria.dia, agora.year, agora.month)).subquery()
+
+    # Contagens, agregados do mês e cashback total em uma única consulta
+    totais = db.session.execute(db.select(
+        db.select(db.func.count(Cliente.id)).scalar_subquery(),
+        db.select(db.func.count(Fornecedor.id)).scalar_subquery(),
+        db.select(db.func.count(User.id)).where(
+            User.tipo_usuario == 'fornecedor',
+            User.aprovado == False
+        ).scalar_subquery(),
+        mes.c.pedidos,
+        mes.c.faturamento,
+        mes.c.volume,
+        db.select(
+            db.func.coalesce(db.func.sum(Cliente.cashback_acumulado), 0)
+        ).scalar_subquery()
+    ).select_from(mes)).one()
+    (total_clientes, total_fornecedores, fornecedores_pendentes,
+     pedidos_mes, faturamento_mes, volume_mes, cashback_total) = totais
+
+    ultimos_pedidos = db.session.query(Pedido, Cliente, User).join(
+        Cliente, Pedido.cliente_id == Cliente.id
+    ).join(
+        User, Cliente.user_id == User.id
+    ).order_by(Pedido.data_pedido.desc()).limit(10).all()
+
+    niveis = db.session.query(
+        Cliente.nivel_parceria,
+        db.func.count(Cliente.id).label('count')
+    ).group_by(Cliente.nivel_parceria).all()
+
+    return {
+        'estatisticas': {
+            'total_clientes': total_clientes,
+            'total_fornecedores': total_fornecedores,
+            'fornecedores_pendentes': fornecedores_pendentes,
+            'pedidos_mes': pedidos_mes,
+            'faturamento_mes': float(faturamento_mes),
+            'volume_mes': float(volume_mes),
+            'cashback_total': float(cashback_total)
+        },
+        'ultimos_pedidos': [
+            {
+                'pedido': pedido.to_dict(),
+                'cliente': {
+                    'nome': user.nome,
+                    'email': user.email,
+                    'empresa': cliente.empresa
+                }
+            }
+            for pedido, cliente, user in ultimos_pedidos
+        ],
+        'distribuicao_niveis': [
+            {'nivel': nivel, 'count': count}
+            for nivel, count in niveis
+        ]
+    }
+
+
+def dashboard_admin():
+    """Payload do dashboard do administrador, calculado uma vez por TTL/invalidação"""
+    return _em_cache('admin', _calcular_dashboard_admin)
+
+
+def _clientes_liberados(consulta):
+    """Restringe a consulta aos clientes ativos e aprovados"""
+    return consulta.join(User, Cliente.user_id == User.id).filter(
+        User.ativo == True,
+        User.aprovado == True
+    )
+
+
+def _calcular_clientes_por_nivel():
+    contagens = dict(_clientes_liberados(db.session.query(
+        Cliente.nivel_parceria,
+        db.func.count(Cliente.id)
+    )).group_by(Cliente.nivel_parceria).all())
+    return {**{nivel: 0 for nivel in NIVEIS_PARCERIA}, **contagens}
+
+
+def clientes_por_nivel():
+    """Clientes ativos e aprovados por nível de parceria (iguais para todos os fornecedores)"""
+    return _em_cache('clientes_por_nivel', _calcular_clientes_por_nivel)
+
+
+def _calcular_estatisticas_clientes():
+    clientes_por_cidade = _clientes_liberados(db.session.query(
+        Cliente.cidade,
+        db.func.count(Cliente.id).label('count')
+    )).filter(
+        Cliente.cidade.isnot(None)
+    ).group_by(Cliente.cidade).order_by(db.func.count(Cliente.id).desc()).limit(10).all()
+
+    data_limite = datetime.now() - timedelta(days=30)
+    clientes_ativos = _clientes_liberados(db.session.query(
+        User.nome,
+        Cliente.empresa,
+        Cliente.cidade,
+        Cliente.nivel_parceria,
+        Cliente.data_ultima_compra
+    )).filter(
+        Cliente.data_ultima_compra >= data_limite
+    ).order_by(Cliente.data_ultima_compra.desc()).limit(20).all()
+
+    return {
+        'clientes_por_cidade': [
+            {'cidade': cidade, 'count': count}
+            for cidade, count in clientes_por_cidade
+        ],
+        'clientes_por_nivel': [
+            {'nivel': nivel, 'count': count}
+            for nivel, count in clientes_por_nivel().items()
+            if count
+        ],
+        'clientes_ativos_recentes': [
+            {
+                'nome': nome,
+                'empresa': empresa,
+                'cidade': cidade,
+                'nivel_parceria': nivel,
+                'data_ultima_compra': data_ultima_compra.isoformat() if data_ultima_compra else None
+            }
+            for nome, empresa, cidade, nivel, data_ultima_compra in clientes_ativos
+        ]
+    }
+
+
+def estatisticas_clientes():
+    """Estatísticas globais de clientes exibidas aos fornecedores"""
+    return _em_cache('estatisticas_clientes', _calcular_estatisticas_clientes)
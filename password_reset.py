@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import User, db
+from src.routes.auth import registrar_revogacao
 import secrets
 import string
 from datetime import datetime, timedelta
@@ -91,14 +92,16 @@ def reset_password():
             db.session.commit()
             return jsonify({'message': 'Token expirado'}), 400
         
-        # Atualiza a senha
+        # Atualiza a senha e revoga as sessões existentes
         user.set_password(new_password)
+        versao = user.revogar_tokens()
         
         # Remove o token usado
         user.reset_token = None
         user.reset_token_expiration = None
         
         db.session.commit()
+        registrar_revogacao(user.id, versao)
         
         return jsonify({'message': 'Senha alterada com sucesso'}), 200
         
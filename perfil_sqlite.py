@@ -0,0 +1,59 @@
+import os
+from sqlalchemy import event
+
+# Pragmas aplicados em cada conexão nova, por ambiente (SQLITE_PROFILE)
+PERFIS_SQLITE = {
+    'producao': {
+        'journal_mode': 'WAL',          # Leitores não bloqueiam escritores (e vice-versa)
+        'busy_timeout': 5000,           # Espera pelo lock em vez de falhar com "database is locked"
+        'synchronous': 'NORMAL',        # Seguro com WAL; evita fsync a cada commit
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,           # Negativo = KiB (~64 MB por conexão)
+        'temp_store': 'MEMORY'
+    },
+    'desenvolvimento': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'temp_store': 'MEMORY'
+    },
+    'teste': {
+        'journal_mode': 'MEMORY',
+        'busy_timeout': 5000,
+        'synchronous': 'OFF',
+        'temp_store': 'MEMORY'
+    }
+}
+
+
+def pragmas_do_ambiente(perfil=None):
+    """Pragmas do perfil (SQLITE_PROFILE, padrão 'producao'), com ajustes por variável.
+
+    Cada pragma pode ser sobrescrito com SQLITE_<PRAGMA>, ex.: SQLITE_BUSY_TIMEOUT=10000.
+    """
+    perfil = perfil or os.environ.get('SQLITE_PROFILE', 'producao')
+    if perfil not in PERFIS_SQLITE:
+        raise ValueError(f'Perfil SQLite inválido: {perfil}')
+
+    pragmas = dict(PERFIS_SQLITE[perfil])
+    for nome in ['journal_mode', 'busy_timeout', 'synchronous', 'mmap_size', 'cache_size', 'temp_store']:
+        valor = os.environ.get(f'SQLITE_{nome.upper()}')
+        if valor:
+            pragmas[nome] = valor
+    return pragmas
+
+
+def aplicar_pragmas(engine, pragmas):
+    """Executa os pragmas em cada conexão que o engine abrir (evento connect)"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _configurar_conexao(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        try:
+            for nome, valor in pragmas.items():
+                cursor.execute(f'PRAGMA {nome} = {valor}')
+        finally:
+            cursor.close()
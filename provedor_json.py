@@ -0,0 +1,48 @@
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Sem orjson, o provedor usa o json da biblioteca padrão
+    orjson = None
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor JSON do Flask que codifica com orjson quando disponível.
+
+    Datas e horários saem em ISO 8601 (como nos to_dict dos modelos), tanto no
+    orjson, que os codifica nativamente, quanto no fallback da biblioteca padrão.
+    """
+
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _opcoes(self):
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._opcoes()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        corpo = orjson.dumps(obj, default=self.default, option=self._opcoes())
+        return self._app.response_class(corpo, mimetype=self.mimetype)
@@ -0,0 +1,273 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import String, cast, literal, null, union_all
+from src.models.user import db, Cliente, ConfiguracaoSistema, Pedido, User, VendaDiaria
+
+STATUS_VENDA = ['entregue', 'processando']
+
+DIMENSOES_RELATORIO = {
+    'tipo_cafe': VendaDiaria.tipo_cafe,
+    'tipo_torra': VendaDiaria.tipo_torra,
+    'status': VendaDiaria.status
+}
+
+_NUMERO_CHAVES = 3
+
+CHAVE_MARCA_CUBO = 'cubo_vendas_atualizado_ate'
+# Reprocessa uma janela antes da marca para cobrir transações gravadas fora de ordem
+SOBREPOSICAO_CUBO = timedelta(seconds=60)
+
+DIMENSOES_CUBO = ['tipo_cafe', 'tipo_torra', 'status', 'estado', 'cidade']
+
+GRANULARIDADES_CUBO = {
+    'dia': '%Y-%m-%d',
+    'semana': '%Y-W%W',
+    'mes': '%Y-%m',
+    'ano': '%Y'
+}
+
+
+def calcular_relatorio_vendas(data_inicio, data_fim, dimensoes=(), limite_clientes=10):
+    """Calcula todas as seções do relatório de vendas em uma única consulta.
+
+    Resumo, vendas por mês e as dimensões pedidas são agrupamentos do cubo de
+    vendas diário; só o ranking de clientes, que o cubo não guarda, lê os
+    pedidos do período. As seções são combinadas com UNION ALL. O período vai
+    do início de data_inicio ao fim de data_fim.
+    """
+    vendas = db.select(VendaDiaria).where(
+        VendaDiaria.dia >= data_inicio.date(),
+        VendaDiaria.dia <= data_fim.date(),
+        VendaDiaria.status.in_(STATUS_VENDA)
+    ).cte('vendas')
+
+    def agregado(secao, *chaves):
+        colunas_chave = [cast(chave, String) for chave in chaves]
+        colunas_chave += [null()] * (_NUMERO_CHAVES - len(colunas_chave))
+        return db.select(
+            literal(secao).label('secao'),
+            *[coluna.label(f'chave{i}') for i, coluna in enumerate(colunas_chave)],
+            db.func.coalesce(db.func.sum(vendas.c.quantidade), 0).label('quantidade'),
+            db.func.sum(vendas.c.faturamento).label('faturamento'),
+            db.func.sum(vendas.c.volume).label('volume')
+        ).select_from(vendas)
+
+    ano = db.func.strftime('%Y', vendas.c.dia)
+    mes = db.func.strftime('%m', vendas.c.dia)
+    secoes = [
+        agregado('resumo'),
+        agregado('mes', ano, mes).group_by(ano, mes)
+    ]
+    for dimensao in dimensoes:
+        coluna = vendas.c[dimensao]
+        secoes.append(agregado(dimensao, coluna).group_by(coluna))
+
+    top = db.select(
+        Pedido.cliente_id,
+        db.func.count().label('quantidade'),
+        db.func.sum(Pedido.valor_total).label('valor_total'),
+        db.func.sum(Pedido.quantidade_kg).label('quantidade_kg')
+    ).where(
+        Pedido.data_pedido >= data_inicio,
+        Pedido.data_pedido < datetime.combine(data_fim.date() + timedelta(days=1), time.min),
+        Pedido.status.in_(STATUS_VENDA)
+    ).group_by(Pedido.cliente_id).order_by(
+        db.func.sum(Pedido.valor_total).desc()
+    ).limit(limite_clientes).subquery('top')
+    secoes.append(db.select(
+        literal('cliente').label('secao'),
+        cast(top.c.cliente_id, String).label('chave0'),
+        User.nome.label('chave1'),
+        Cliente.empresa.label('chave2'),
+        top.c.quantidade,
+        top.c.valor_total.label('faturamento'),
+        top.c.quantidade_kg.label('volume')
+    ).join_from(top, Cliente, top.c.cliente_id == Cliente.id).join(User, Cliente.user_id == User.id))
+
+    resultado = {
+        'resumo': None,
+        'vendas_por_mes': [],
+        'top_clientes': [],
+        'por_dimensao': {dimensao: [] for dimensao in dimensoes}
+    }
+    for secao, chave0, chave1, chave2, quantidade, faturamento, volume in db.session.execute(union_all(*secoes)):
+        quantidade = int(quantidade)
+        faturamento = float(faturamento or 0)
+        volume = float(volume or 0)
+
+        if secao == 'resumo':
+            resultado['resumo'] = {
+                'total_vendas': quantidade,
+                'faturamento_total': faturamento,
+                'volume_total': volume,
+                'ticket_medio': faturamento / quantidade if quantidade > 0 else 0.0
+            }
+        elif secao == 'mes':
+            resultado['vendas_por_mes'].append({
+                'ano': int(chave0),
+                'mes': int(chave1),
+                'quantidade': quantidade,
+                'faturamento': faturamento,
+                'volume': volume
+            })
+        elif secao == 'cliente':
+            resultado['top_clientes'].append({
+                'cliente_id': int(chave0),
+                'nome': chave1,
+                'empresa': chave2,
+                'total_pedidos': quantidade,
+                'total_gasto': faturamento,
+                'total_kg': volume
+            })
+        else:
+            resultado['por_dimensao'][secao].append({
+                secao: chave0,
+                'quantidade': quantidade,
+                'faturamento': faturamento,
+                'volume': volume
+            })
+
+    resultado['vendas_por_mes'].sort(key=lambda v: (v['ano'], v['mes']))
+    resultado['top_clientes'].sort(key=lambda c: c['total_gasto'], reverse=True)
+    return resultado
+
+
+def _agregar_dias(dias=None):
+    """Insere no cubo os agregados de pedidos dos dias informados (ou de todos)"""
+    dia = db.func.date(Pedido.data_pedido)
+    consulta = db.select(
+        dia,
+        Pedido.tipo_cafe,
+        Pedido.tipo_torra,
+        Pedido.status,
+        Cliente.estado,
+        Cliente.cidade,
+        db.func.count(Pedido.id),
+        db.func.sum(Pedido.quantidade_kg),
+        db.func.sum(Pedido.valor_total)
+    ).join_from(
+        Pedido, Cliente, Pedido.cliente_id == Cliente.id
+    ).group_by(
+        dia, Pedido.tipo_cafe, Pedido.tipo_torra, Pedido.status, Cliente.estado, Cliente.cidade
+    )
+    if dias is not None:
+        # Faixa de data_pedido no índice, e só os dias pedidos dentro dela
+        consulta = consulta.where(
+            Pedido.data_pedido >= datetime.combine(min(dias), time.min),
+            Pedido.data_pedido < datetime.combine(max(dias) + timedelta(days=1), time.min),
+            dia.in_([d.isoformat() for d in dias])
+        )
+
+    db.session.execute(db.insert(VendaDiaria).from_select(
+        ['dia', *DIMENSOES_CUBO, 'quantidade', 'volume', 'faturamento'],
+        consulta
+    ))
+
+
+def reagregar_dias_cubo(dias):
+    """Refaz no cubo, na transação atual, os agregados dos dias informados.
+
+    As rotas que gravam pedidos chamam com o dia de cada pedido alterado (o
+    status é uma dimensão do cubo), e a mudança de endereço do cliente com os
+    dias dos seus pedidos; assim o cubo acompanha cada commit.
+    """
+    dias = sorted({d.date() if isinstance(d, datetime) else d for d in dias if d})
+    db.session.flush()
+    for inicio in range(0, len(dias), 500):
+        bloco = dias[inicio:inicio + 500]
+        VendaDiaria.query.filter(VendaDiaria.dia.in_(bloco)).delete(synchronize_session=False)
+        _agregar_dias(bloco)
+    return len(dias)
+
+
+def reagregar_cliente_cubo(cliente_id):
+    """Refaz os dias com pedidos do cliente (estado e cidade são dimensões do cubo)"""
+    dias = db.session.scalars(
+        db.select(db.func.date(Pedido.data_pedido)).where(Pedido.cliente_id == cliente_id).distinct()
+    ).all()
+    return reagregar_dias_cubo([date.fromisoformat(d) for d in dias if d])
+
+
+def _gravar_marca(marca):
+    config = ConfiguracaoSistema.query.filter_by(chave=CHAVE_MARCA_CUBO).first()
+    if config is None:
+        config = ConfiguracaoSistema(
+            chave=CHAVE_MARCA_CUBO,
+            descricao='Última alteração de pedido refletida no cubo de vendas'
+        )
+        db.session.add(config)
+    config.valor = marca.isoformat()
+    config.data_atualizacao = datetime.utcnow()
+
+
+def reconstruir_cubo_vendas():
+    """Recria o cubo de vendas inteiro a partir da tabela de pedidos"""
+    marca = db.session.query(db.func.max(Pedido.data_atualizacao)).scalar() or datetime.utcnow()
+
+    VendaDiaria.query.delete()
+    _agregar_dias()
+    _gravar_marca(marca)
+    db.session.commit()
+
+
+def atualizar_cubo_vendas():
+    """Reagrega apenas os dias com pedidos alterados desde a última atualização.
+
+    As rotas já mantêm o cubo a cada escrita (reagregar_dias_cubo); esta
+    passagem cobre pedidos gravados fora delas. Pedidos apagados diretamente no
+    banco não deixam data_atualizacao: exigem reconstruir_cubo_vendas.
+    Retorna o número de dias reprocessados; sem marca anterior, reconstrói tudo.
+    """
+    config = ConfiguracaoSistema.query.filter_by(chave=CHAVE_MARCA_CUBO).first()
+    if config is None:
+        reconstruir_cubo_vendas()
+        return None
+
+    marca = datetime.fromisoformat(config.valor)
+    dia = db.func.date(Pedido.data_pedido)
+    alterados = db.session.query(dia, db.func.max(Pedido.data_atualizacao)).filter(
+        Pedido.data_atualizacao > marca - SOBREPOSICAO_CUBO
+    ).group_by(dia).all()
+
+    nova_marca = max([ultima for _, ultima in alterados if ultima] + [marca])
+    dias = reagregar_dias_cubo([date.fromisoformat(d) for d, _ in alterados if d])
+    if not dias:
+        return 0
+
+    _gravar_marca(nova_marca)
+    db.session.commit()
+    return dias
+
+
+def consultar_cubo_vendas(data_inicio, data_fim, granularidade='dia', dimensoes=(), filtros=None):
+    """Agrega o cubo por período (dia, semana, mes, ano) e dimensões, com filtros opcionais"""
+    periodo = db.func.strftime(GRANULARIDADES_CUBO[granularidade], VendaDiaria.dia)
+    colunas = [getattr(VendaDiaria, dimensao) for dimensao in dimensoes]
+
+    consulta = db.session.query(
+        periodo,
+        *colunas,
+        db.func.sum(VendaDiaria.quantidade),
+        db.func.sum(VendaDiaria.volume),
+        db.func.sum(VendaDiaria.faturamento)
+    ).filter(
+        VendaDiaria.dia >= data_inicio,
+        VendaDiaria.dia <= data_fim
+    )
+    for dimensao, valores in (filtros or {}).items():
+        consulta = consulta.filter(getattr(VendaDiaria, dimensao).in_(valores))
+
+    # Linhas zeradas ficam no cubo quando um pedido muda de status ou de dia
+    linhas = consulta.group_by(periodo, *colunas).having(
+        db.func.sum(VendaDiaria.quantidade) != 0
+    ).order_by(periodo, *colunas).all()
+
+    return [
+        {
+            'periodo': linha[0],
+            **dict(zip(dimensoes, linha[1:1 + len(dimensoes)])),
+            'quantidade': int(linha[-3] or 0),
+            'volume': float(linha[-2] or 0),
+            'faturamento': float(linha[-1] or 0)
+        }
+        for linha in linhas
+    ]
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+import os
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Sem brotli, comprime apenas com gzip
+    brotli = None
+
+# Respostas JSON menores que isso não compensam a compressão
+TAMANHO_MINIMO_COMPRESSAO = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+NIVEL_GZIP = 6
+
+
+def etag_do_conteudo(dados):
+    return hashlib.blake2b(dados, digest_size=16).hexdigest()
+
+
+def nao_modificado(etag):
+    """Resposta 304 se o cliente já tem a versão `etag` (ETag fraca); senão None.
+
+    Permite que a rota responda antes de montar e serializar o payload.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    resposta = current_app.response_class(status=304)
+    resposta.set_etag(etag, weak=True)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+def _aceita(codificacao):
+    return request.accept_encodings[codificacao] > 0
+
+
+def _comprimir(resposta):
+    dados = resposta.get_data()
+    if brotli is not None and _aceita('br'):
+        resposta.set_data(brotli.compress(dados, quality=5))
+        resposta.headers['Content-Encoding'] = 'br'
+    elif _aceita('gzip'):
+        resposta.set_data(gzip.compress(dados, compresslevel=NIVEL_GZIP))
+        resposta.headers['Content-Encoding'] = 'gzip'
+
+
+def preparar_resposta(resposta):
+    """ETag fraca + 304 condicional e compressão para as respostas JSON da API"""
+    if request.method not in ('GET', 'HEAD') or not resposta.is_json:
+        return resposta
+    if resposta.is_streamed or resposta.direct_passthrough:
+        return resposta
+
+    if resposta.status_code == 200:
+        if 'ETag' not in resposta.headers:
+            resposta.set_etag(etag_do_conteudo(resposta.get_data()), weak=True)
+        resposta.headers.setdefault('Cache-Control', 'private, no-cache')
+        resposta.vary.update(['Authorization', 'Accept-Encoding'])
+        resposta.make_conditional(request)
+
+    if (resposta.status_code == 200 and 'Content-Encoding' not in resposta.headers
+            and resposta.content_length and resposta.content_length >= TAMANHO_MINIMO_COMPRESSAO):
+        _comprimir(resposta)
+    return resposta
+
+
+def registrar_respostas_http(app):
+    app.after_request(preparar_resposta)
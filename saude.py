@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+from datetime import datetime
+from flask import jsonify
+from src.models.user import db
+
+# Estado do processo atual; com vários workers, cada um responde pelo seu
+_inicio = time.monotonic()
+_iniciado_em = datetime.utcnow()
+_requisicoes = 0
+_lock = threading.Lock()
+
+
+def reiniciar_contadores():
+    """Zera os contadores no worker recém-criado (após o fork do processo mestre)"""
+    global _inicio, _iniciado_em, _requisicoes
+    with _lock:
+        _inicio = time.monotonic()
+        _iniciado_em = datetime.utcnow()
+        _requisicoes = 0
+
+
+def _contar_requisicao():
+    global _requisicoes
+    with _lock:
+        _requisicoes += 1
+
+
+def registrar_saude(app):
+    """Conta as requisições do processo e expõe /api/saude com o estado do worker"""
+    app.before_request(_contar_requisicao)
+
+    @app.route('/api/saude', methods=['GET'])
+    def saude():
+        try:
+            db.session.execute(db.text('SELECT 1'))
+            banco = 'ok'
+        except Exception as e:
+            banco = f'erro: {str(e)}'
+
+        return jsonify({
+            'status': 'ok' if banco == 'ok' else 'degradado',
+            'pid': os.getpid(),
+            'iniciado_em': _iniciado_em.isoformat(),
+            'uptime_segundos': round(time.monotonic() - _inicio, 1),
+            'requisicoes': _requisicoes,
+            'threads': threading.active_count(),
+            'banco': banco
+        }), 200 if banco == 'ok' else 503
@@ -0,0 +1,109 @@
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
+from sqlalchemy import inspect as inspecionar
+from sqlalchemy.orm import load_only, selectinload
+from src.models.user import User, Cliente, Fornecedor, Pedido
+
+# Colunas que nunca saem nas respostas (ou que o to_dict do modelo já omitia)
+CAMPOS_OCULTOS = {
+    User: {'password_hash', 'reset_token', 'reset_token_expiration', 'token_version'},
+    Cliente: {'cashback_total_ganho', 'cashback_total_usado'},
+    Pedido: {'data_atualizacao'}
+}
+
+# Relações que podem ser pedidas em ?expand=
+EXPANSOES = {
+    User: ('cliente', 'fornecedor'),
+    Fornecedor: ('beneficios',)
+}
+
+
+def campos_publicos(modelo):
+    ocultos = CAMPOS_OCULTOS.get(modelo, set())
+    return [atributo.key for atributo in inspecionar(modelo).column_attrs if atributo.key not in ocultos]
+
+
+@lru_cache(maxsize=None)
+def serializador(modelo):
+    """Gera, uma vez por modelo, a função objeto -> dict das colunas públicas.
+
+    Os valores saem nativos (datetime inclusive) para o provedor JSON codificar
+    direto em bytes, sem passar pelo to_dict.
+    """
+    campos = tuple(campos_publicos(modelo))
+    obter = attrgetter(*campos)
+    return lambda obj: dict(zip(campos, obter(obj)))
+
+
+def _lista(valor):
+    return [item.strip() for item in (valor or '').split(',') if item.strip()]
+
+
+class Projecao:
+    """Campos (?fields=) e relações (?expand=) pedidos para um modelo.
+
+    Caminhos com ponto descem nas relações: `fields=nome,cliente.empresa` e
+    `expand=fornecedor.beneficios`. Um nível sem campos explícitos traz todos
+    os campos públicos.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.campos = []
+        self.relacoes = {}
+
+    @classmethod
+    def da_requisicao(cls, modelo, args):
+        """Projeção a partir dos parâmetros; None se nenhum dos dois foi enviado"""
+        if 'fields' not in args and 'expand' not in args:
+            return None
+
+        projecao = cls(modelo)
+        for caminho in _lista(args.get('expand')):
+            projecao._no(caminho.split('.'))
+        for caminho in _lista(args.get('fields')):
+            *relacoes, campo = caminho.split('.')
+            no = projecao._no(relacoes)
+            if campo not in campos_publicos(no.modelo):
+                raise ValueError(f'Campo inválido: {caminho}')
+            if campo not in no.campos:
+                no.campos.append(campo)
+        return projecao
+
+    def _no(self, relacoes):
+        no = self
+        for nome in relacoes:
+            if nome not in EXPANSOES.get(no.modelo, ()):
+                raise ValueError(f'Relação inválida: {nome}')
+            if nome not in no.relacoes:
+                alvo = inspecionar(no.modelo).relationships[nome].mapper.class_
+                no.relacoes[nome] = Projecao(alvo)
+            no = no.relacoes[nome]
+        return no
+
+    def colunas(self):
+        return self.campos or campos_publicos(self.modelo)
+
+    def opcoes(self, incluir_raiz=True, carregar=()):
+        """Opções de carga: só as colunas pedidas e as relações expandidas (em lote)"""
+        opcoes = []
+        if incluir_raiz:
+            colunas = list(dict.fromkeys([*self.colunas(), *carregar]))
+            opcoes.append(load_only(*[getattr(self.modelo, coluna) for coluna in colunas]))
+        for nome, filho in self.relacoes.items():
+            opcoes.append(selectinload(getattr(self.modelo, nome)).options(*filho.opcoes()))
+        return opcoes
+
+    def serializar(self, obj):
+        dados = {}
+        for campo in self.colunas():
+            valor = getattr(obj, campo)
+            dados[campo] = valor.isoformat() if isinstance(valor, datetime) else valor
+        for nome, filho in self.relacoes.items():
+            valor = getattr(obj, nome)
+            if isinstance(valor, list):
+                dados[nome] = [filho.serializar(item) for item in valor]
+            elif valor is not None:
+                dados[nome] = filho.serializar(valor)
+        return dados
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+# Pasta que contém src/ no path, como em src/main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from src.main import create_app, inicializar_banco
+from src.models.user import db, User, Cliente
+from src.routes import auth
+from src.utils.catalogo import invalidar_catalogo
+from src.utils.paineis import invalidar_paineis
+
+# Hash calculado uma vez: gerar um por usuário domina o tempo dos testes
+SENHA_HASH = generate_password_hash('senha')
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplicação com um banco SQLite em arquivo, novo a cada teste"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}"
+    })
+    with app.app_context():
+        inicializar_banco()
+
+    # Caches do processo não podem carregar dados de outro banco de teste
+    auth._cache_usuarios.clear()
+    auth._revogacoes_sincronizado_em = None
+    invalidar_paineis()
+    invalidar_catalogo()
+
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def cabecalho(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def criar_usuario(email, tipo_usuario='cliente', **perfil):
+    """Cria um usuário (com perfil de cliente, se for o caso); retorna o User"""
+    user = User(email=email, nome=email.split('@')[0], tipo_usuario=tipo_usuario)
+    user.password_hash = SENHA_HASH
+    db.session.add(user)
+    db.session.flush()
+    if tipo_usuario == 'cliente':
+        db.session.add(Cliente(user_id=user.id, **perfil))
+    db.session.commit()
+    return user
+
+
+def token_admin(app):
+    with app.app_context():
+        return User.query.filter_by(tipo_usuario='admin').first().generate_token()
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.models.user import db, Cliente, TransacaoCashback
+from conftest import cabecalho, criar_usuario
+
+SALDO = 50
+DEBITOS = 300
+THREADS = 16
+
+
+def test_debitos_paralelos_respeitam_o_saldo(app):
+    with app.app_context():
+        user = criar_usuario('cliente@teste.com', cashback_acumulado=SALDO, cashback_total_ganho=SALDO)
+        cliente_id = user.cliente.id
+        token = user.generate_token()
+
+    def debitar(_):
+        resposta = app.test_client().post(
+            '/api/cliente/usar-cashback', json={'valor': 1.0}, headers=cabecalho(token)
+        )
+        return resposta.status_code
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        status = list(executor.map(debitar, range(DEBITOS)))
+
+    assert status.count(200) == SALDO
+    assert status.count(400) == DEBITOS - SALDO
+
+    with app.app_context():
+        cliente = db.session.get(Cliente, cliente_id)
+        assert cliente.cashback_acumulado == 0
+        assert cliente.cashback_total_usado == SALDO
+        assert TransacaoCashback.query.filter_by(cliente_id=cliente_id, tipo='uso').count() == SALDO
+
+
+def test_creditos_e_debitos_paralelos_nao_perdem_atualizacoes(app):
+    with app.app_context():
+        cliente_id = criar_usuario('cliente@teste.com').cliente.id
+
+    def creditar(_):
+        with app.app_context():
+            Cliente.creditar_cashback(cliente_id, 2.0)
+            db.session.commit()
+
+    def debitar(_):
+        with app.app_context():
+            debitado = Cliente.debitar_cashback(cliente_id, 1.0)
+            db.session.commit()
+            return debitado
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(creditar, range(DEBITOS)))
+        debitados = list(executor.map(debitar, range(DEBITOS)))
+
+    assert all(debitados)
+    with app.app_context():
+        cliente = db.session.get(Cliente, cliente_id)
+        assert cliente.cashback_total_ganho == 2.0 * DEBITOS
+        assert cliente.cashback_total_usado == 1.0 * DEBITOS
+        assert cliente.cashback_acumulado == 1.0 * DEBITOS
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import event
+
+from src.models.user import db, Fornecedor, BeneficioFornecedor
+from conftest import cabecalho, criar_usuario, token_admin
+
+CLIENTES = 60
+FORNECEDORES = 60
+# count + página + perfis de cliente + perfis de fornecedor + benefícios
+ORCAMENTO = 5
+
+
+@pytest.fixture
+def usuarios(app):
+    with app.app_context():
+        for i in range(CLIENTES):
+            criar_usuario(f'cliente{i}@teste.com', empresa=f'Empresa {i}')
+        for i in range(FORNECEDORES):
+            user = criar_usuario(f'fornecedor{i}@teste.com', tipo_usuario='fornecedor')
+            db.session.add(Fornecedor(
+                user_id=user.id,
+                nome_empresa=f'Fornecedor {i}',
+                categoria='cafe',
+                beneficios=[
+                    BeneficioFornecedor(descricao=f'Desconto {nivel}', nivel_minimo=nivel)
+                    for nivel in ['inicial', 'elite']
+                ]
+            ))
+        db.session.commit()
+    return app
+
+
+def contar_consultas(app, url, token):
+    cliente = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    consultas = []
+
+    def registrar(conexao, cursor, sql, parametros, contexto, executemany):
+        consultas.append(sql)
+
+    event.listen(engine, 'before_cursor_execute', registrar)
+    try:
+        resposta = cliente.get(url, headers=cabecalho(token))
+    finally:
+        event.remove(engine, 'before_cursor_execute', registrar)
+    assert resposta.status_code == 200, resposta.json
+    return len(consultas), resposta.json
+
+
+@pytest.mark.parametrize('parametros', [
+    '',
+    '&expand=cliente,fornecedor',
+    '&fields=id,nome,cliente.empresa&expand=fornecedor.beneficios',
+    '&after=',
+    '&after=&expand=cliente,fornecedor.beneficios'
+])
+def test_consultas_por_pagina_nao_dependem_do_tamanho(usuarios, parametros):
+    token = token_admin(usuarios)
+    # Primeira requisição sincroniza as revogações; fica fora da contagem
+    usuarios.test_client().get('/api/admin/usuarios', headers=cabecalho(token))
+
+    pequena, dados_pequena = contar_consultas(usuarios, f'/api/admin/usuarios?per_page=10{parametros}', token)
+    grande, dados_grande = contar_consultas(usuarios, f'/api/admin/usuarios?per_page=100{parametros}', token)
+
+    assert len(dados_pequena['usuarios']) == 10
+    assert len(dados_grande['usuarios']) == 100
+    assert pequena == grande
+    assert grande <= ORCAMENTO
+
+
+def test_pagina_completa_traz_perfis_e_beneficios(usuarios):
+    token = token_admin(usuarios)
+    resposta = usuarios.test_client().get('/api/admin/usuarios?per_page=100', headers=cabecalho(token))
+
+    for user in resposta.json['usuarios']:
+        if user['tipo_usuario'] == 'fornecedor':
+            assert len(user['fornecedor']['beneficios']) == 2
+        elif user['tipo_usuario'] == 'cliente':
+            assert user['cliente']['empresa'].startswith('Empresa')
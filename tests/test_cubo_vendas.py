@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from src.models.user import db, Pedido
+from conftest import cabecalho, criar_usuario, token_admin
+
+
+def test_rotas_mantem_o_cubo_em_dia(app):
+    with app.app_context():
+        user = criar_usuario('cliente@teste.com', estado='SP', cidade='Campinas')
+        token = user.generate_token()
+    admin = token_admin(app)
+    cliente = app.test_client()
+    hoje = datetime.now().strftime('%Y-%m-%d')
+
+    for kg, valor in [(10, 300.0), (5, 150.0), (2, 60.0)]:
+        resposta = cliente.post('/api/cliente/criar-pedido', headers=cabecalho(token), json={
+            'quantidade_kg': kg, 'tipo_cafe': 'graos', 'tipo_torra': 'media', 'valor_total': valor
+        })
+        assert resposta.status_code == 201
+
+    with app.app_context():
+        ids = [p.id for p in Pedido.query.order_by(Pedido.id)]
+    for pedido_id, status in zip(ids, ['entregue', 'processando', 'cancelado']):
+        resposta = cliente.put(f'/api/admin/atualizar-status-pedido/{pedido_id}',
+                               headers=cabecalho(admin), json={'status': status})
+        assert resposta.status_code == 200
+
+    resposta = cliente.put('/api/auth/update-profile', headers=cabecalho(token), json={'estado': 'MG'})
+    assert resposta.status_code == 200
+
+    relatorio = cliente.get(f'/api/admin/relatorio-vendas?data_inicio={hoje}&data_fim={hoje}&dimensoes=status',
+                            headers=cabecalho(admin)).get_json()
+    assert relatorio['resumo']['total_vendas'] == 2
+    assert relatorio['resumo']['faturamento_total'] == 450.0
+    assert relatorio['top_clientes'][0]['total_pedidos'] == 2
+    assert {d['status']: d['quantidade'] for d in relatorio['por_dimensao']['status']} == {
+        'entregue': 1, 'processando': 1
+    }
+
+    cubo = cliente.get(f'/api/admin/cubo-vendas?data_inicio={hoje}&data_fim={hoje}&dimensoes=estado,status',
+                       headers=cabecalho(admin)).get_json()
+    assert {(l['estado'], l['status']): l['quantidade'] for l in cubo['linhas']} == {
+        ('MG', 'entregue'): 1, ('MG', 'processando'): 1, ('MG', 'cancelado'): 1
+    }
+
+    estatisticas = cliente.get('/api/admin/dashboard', headers=cabecalho(admin)).get_json()['estatisticas']
+    assert estatisticas['pedidos_mes'] == 3
+    assert estatisticas['volume_mes'] == 17.0
+
+
+def test_importacao_entra_no_cubo(app):
+    with app.app_context():
+        cliente_id = criar_usuario('cliente@teste.com', estado='SP').cliente.id
+    admin = token_admin(app)
+    linhas = '\n'.join(
+        f'{{"cliente_id": {cliente_id}, "quantidade_kg": 3, "valor_total": 90, '
+        f'"tipo_cafe": "moido", "tipo_torra": "escura", "data_pedido": "2026-03-{dia:02d}"}}'
+        for dia in (2, 2, 9)
+    )
+    resposta = app.test_client().post('/api/admin/importar-compras?formato=ndjson',
+                                      headers=cabecalho(admin), data=linhas)
+    assert resposta.get_json()['importados'] == 3
+
+    cubo = app.test_client().get('/api/admin/cubo-vendas?data_inicio=2026-03-01&data_fim=2026-03-31',
+                                 headers=cabecalho(admin)).get_json()
+    assert [(l['periodo'], l['quantidade']) for l in cubo['linhas']] == [('2026-03-02', 2), ('2026-03-09', 1)]
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from src.models.user import db, Cliente, ResumoMensalCliente
+from conftest import criar_usuario
+
+
+def test_virada_do_mes_regrava_o_nivel(app):
+    with app.app_context():
+        elite = criar_usuario('elite@teste.com', nivel_parceria='elite', total_compras_mes=90).cliente.id
+        ativo = criar_usuario('ativo@teste.com', nivel_parceria='elite', total_compras_mes=90).cliente.id
+        ResumoMensalCliente.registrar(ativo, datetime(2026, 11, 3), 45, 900)
+        db.session.commit()
+
+        assert Cliente.recalcular_niveis(datetime(2026, 11, 1)) == 2
+        db.session.commit()
+
+        niveis = dict(db.session.query(Cliente.id, Cliente.nivel_parceria).all())
+        assert niveis == {elite: 'inicial', ativo: 'avancado'}
+        assert db.session.get(Cliente, elite).total_compras_mes == 0
+        assert Cliente.niveis_vigentes([elite, ativo], datetime(2026, 11, 1)) == niveis
@@ -1,12 +1,46 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import calendar
 import jwt
 import os
 
 db = SQLAlchemy()
 
+NIVEIS_PARCERIA = ['inicial', 'avancado', 'elite']
+
+# Volume mensal mínimo (kg) de cada nível acima do inicial, do maior para o menor
+LIMITES_NIVEL = [(80, 'elite'), (40, 'avancado')]
+
+VALIDADE_TOKEN = timedelta(days=7)
+
+def intervalo_mes(ano, mes):
+    """Retorna o intervalo semiaberto [início, fim) de um mês"""
+    inicio = datetime(ano, mes, 1)
+    if mes == 12:
+        fim = datetime(ano + 1, 1, 1)
+    else:
+        fim = datetime(ano, mes + 1, 1)
+    return inicio, fim
+
+def intervalo_ano(ano):
+    """Retorna o intervalo semiaberto [início, fim) de um ano"""
+    return datetime(ano, 1, 1), datetime(ano + 1, 1, 1)
+
+def filtro_mes(coluna, ano, mes):
+    """Filtro por mês que aproveita índices na coluna de data"""
+    inicio, fim = intervalo_mes(ano, mes)
+    return db.and_(coluna >= inicio, coluna < fim)
+
+def filtro_ano(coluna, ano):
+    """Filtro por ano que aproveita índices na coluna de data"""
+    inicio, fim = intervalo_ano(ano)
+    return db.and_(coluna >= inicio, coluna < fim)
+
 class User(db.Model):
+    # Ids de usuários removidos não são reaproveitados (bancos novos)
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -16,6 +50,7 @@ class User(db.Model):
     ativo = db.Column(db.Boolean, default=True)
     aprovado = db.Column(db.Boolean, default=True)  # Para fornecedores que precisam de aprovação
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    token_version = db.Column(db.Integer, nullable=False, default=0)  # Incrementada para revogar tokens emitidos
     
     # Campos para reset de senha
     reset_token = db.Column(db.String(255), nullable=True)
@@ -35,10 +70,17 @@ class User(db.Model):
         payload = {
             'user_id': self.id,
             'tipo_usuario': self.tipo_usuario,
-            'exp': datetime.utcnow() + timedelta(days=7)
+            'ver': self.token_version or 0,
+            'iat': datetime.utcnow(),
+            'exp': datetime.utcnow() + VALIDADE_TOKEN
         }
         return jwt.encode(payload, os.environ.get('SECRET_KEY', 'default-secret'), algorithm='HS256')
 
+    def revogar_tokens(self):
+        """Invalida todos os tokens já emitidos para o usuário"""
+        self.token_version = (self.token_version or 0) + 1
+        return self.token_version
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -51,6 +93,38 @@ class User(db.Model):
             'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None
         }
 
+class TokenRevogado(db.Model):
+    """Revogação persistente dos tokens de uma conta removida.
+
+    Vale só para tokens emitidos (iat) até revogado_em: se o id for reaproveitado,
+    os tokens da nova conta não são afetados.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    revogado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def instante(data):
+        """Segundos desde a época (UTC), na mesma resolução do iat do token"""
+        return calendar.timegm(data.utctimetuple())
+
+    @classmethod
+    def registrar(cls, user_id):
+        """Grava a revogação na transação atual; retorna o limite de emissão revogado"""
+        agora = datetime.utcnow()
+        # Revogações mais antigas que a validade do token já não barram nada
+        cls.query.filter(cls.revogado_em < agora - VALIDADE_TOKEN).delete()
+        db.session.add(cls(user_id=user_id, revogado_em=agora))
+        return cls.instante(agora)
+
+    @classmethod
+    def vigentes(cls):
+        """user_id -> limite de emissão revogado, para as revogações ainda relevantes"""
+        linhas = db.session.query(cls.user_id, db.func.max(cls.revogado_em)).filter(
+            cls.revogado_em >= datetime.utcnow() - VALIDADE_TOKEN
+        ).group_by(cls.user_id).all()
+        return {user_id: cls.instante(revogado_em) for user_id, revogado_em in linhas}
+
 class Cliente(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -62,31 +136,117 @@ class Cliente(db.Model):
     cep = db.Column(db.String(10), nullable=True)
     nivel_parceria = db.Column(db.String(20), default='inicial')  # inicial, avancado, elite
     cashback_acumulado = db.Column(db.Float, default=0.0)
+    cashback_total_ganho = db.Column(db.Float, nullable=False, default=0.0)  # Acumulado histórico, evita somar o extrato
+    cashback_total_usado = db.Column(db.Float, nullable=False, default=0.0)
     total_compras_mes = db.Column(db.Float, default=0.0)
     data_ultima_compra = db.Column(db.DateTime, nullable=True)
     
     # Relacionamentos
     pedidos = db.relationship('Pedido', backref='cliente', cascade='all, delete-orphan')
     transacoes_cashback = db.relationship('TransacaoCashback', backref='cliente', cascade='all, delete-orphan')
+    resumos_mensais = db.relationship('ResumoMensalCliente', backref='cliente', cascade='all, delete-orphan')
 
-    def calcular_nivel_parceria(self):
-        """Calcula o nível de parceria baseado no volume mensal"""
-        if self.total_compras_mes >= 80:
-            return 'elite'
-        elif self.total_compras_mes >= 40:
-            return 'avancado'
-        elif self.total_compras_mes >= 5:
-            return 'inicial'
-        else:
-            return 'inicial'
+    @staticmethod
+    def nivel_para_volume(total_kg):
+        """Retorna o nível de parceria correspondente a um volume mensal"""
+        for limite, nivel in LIMITES_NIVEL:
+            if total_kg >= limite:
+                return nivel
+        return 'inicial'
 
-    def get_taxa_cashback(self):
-        """Retorna a taxa de cashback baseada no nível"""
-        if self.nivel_parceria == 'elite':
+    @staticmethod
+    def taxa_cashback_para_nivel(nivel):
+        if nivel == 'elite':
             return 0.02  # 2%
         else:
             return 0.015  # 1.5%
 
+    @staticmethod
+    def niveis_beneficio_permitidos(nivel):
+        """Níveis mínimos de benefício acessíveis a um nível de parceria"""
+        if nivel not in NIVEIS_PARCERIA:
+            return ['inicial']
+        return NIVEIS_PARCERIA[:NIVEIS_PARCERIA.index(nivel) + 1]
+
+    @staticmethod
+    def niveis_vigentes(cliente_ids, data=None):
+        """Nível de cada cliente pelo volume do mês no resumo mensal.
+
+        É a fonte do nível exibido no dashboard e aplicado a benefícios e cashback;
+        a coluna nivel_parceria guarda o último valor gravado, para as listagens,
+        e é regravada na virada do mês por Cliente.recalcular_niveis.
+        """
+        data = data or datetime.now()
+        volumes = dict(db.session.query(
+            ResumoMensalCliente.cliente_id,
+            ResumoMensalCliente.total_kg
+        ).filter(
+            ResumoMensalCliente.cliente_id.in_(cliente_ids),
+            ResumoMensalCliente.ano == data.year,
+            ResumoMensalCliente.mes == data.month
+        ).all())
+        return {cliente_id: Cliente.nivel_para_volume(volumes.get(cliente_id) or 0) for cliente_id in cliente_ids}
+
+    def nivel_vigente(self, data=None):
+        return Cliente.niveis_vigentes([self.id], data)[self.id]
+
+    def calcular_nivel_parceria(self):
+        """Calcula o nível de parceria baseado no volume mensal"""
+        return Cliente.nivel_para_volume(self.total_compras_mes or 0)
+
+    def atualizar_nivel_parceria(self, ano, mes):
+        """Atualiza o volume mensal e o nível de parceria a partir do resumo mensal"""
+        resumo = ResumoMensalCliente.obter(self.id, ano, mes)
+        self.total_compras_mes = resumo.total_kg if resumo else 0
+        self.nivel_parceria = self.calcular_nivel_parceria()
+        return self.nivel_parceria
+
+    @classmethod
+    def recalcular_niveis(cls, data=None):
+        """Regrava volume e nível de todos os clientes pelo resumo do mês de `data`.
+
+        Na virada do mês quem ainda não comprou volta ao nível inicial; roda com
+        `flask recalcular-niveis-parceria` (agendado no dia 1) e em inicializar_banco.
+        """
+        data = data or datetime.now()
+        total_kg = db.func.coalesce(
+            db.select(ResumoMensalCliente.total_kg).where(
+                ResumoMensalCliente.cliente_id == cls.id,
+                ResumoMensalCliente.ano == data.year,
+                ResumoMensalCliente.mes == data.month
+            ).scalar_subquery(),
+            0
+        )
+        nivel = db.case(*[(total_kg >= limite, nivel) for limite, nivel in LIMITES_NIVEL], else_='inicial')
+        return cls.query.update({
+            cls.total_compras_mes: total_kg,
+            cls.nivel_parceria: nivel
+        }, synchronize_session=False)
+
+    @classmethod
+    def creditar_cashback(cls, cliente_id, valor):
+        """Credita cashback com um UPDATE atômico, sem ler o saldo em Python"""
+        cls.query.filter(cls.id == cliente_id).update({
+            cls.cashback_acumulado: cls.cashback_acumulado + valor,
+            cls.cashback_total_ganho: cls.cashback_total_ganho + valor
+        }, synchronize_session=False)
+
+    @classmethod
+    def debitar_cashback(cls, cliente_id, valor):
+        """Debita cashback apenas se houver saldo; retorna False caso contrário"""
+        debitados = cls.query.filter(
+            cls.id == cliente_id,
+            cls.cashback_acumulado >= valor
+        ).update({
+            cls.cashback_acumulado: cls.cashback_acumulado - valor,
+            cls.cashback_total_usado: cls.cashback_total_usado + valor
+        }, synchronize_session=False)
+        return debitados > 0
+
+    def get_taxa_cashback(self):
+        """Retorna a taxa de cashback baseada no nível vigente do mês"""
+        return Cliente.taxa_cashback_para_nivel(self.nivel_vigente())
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -154,6 +314,12 @@ class BeneficioFornecedor(db.Model):
         }
 
 class Pedido(db.Model):
+    __table_args__ = (
+        db.Index('ix_pedido_cliente_data', 'cliente_id', 'data_pedido'),
+        db.Index('ix_pedido_data_status', 'data_pedido', 'status'),
+        db.Index('ix_pedido_data_atualizacao', 'data_atualizacao'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
     quantidade_kg = db.Column(db.Float, nullable=False)
@@ -167,6 +333,7 @@ class Pedido(db.Model):
     observacoes = db.Column(db.Text, nullable=True)
     automatico = db.Column(db.Boolean, default=False)  # Se é um pedido automático
     dia_entrega_automatica = db.Column(db.Integer, nullable=True)  # 15 ou 30
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Marca para o cubo de vendas
 
     def to_dict(self):
         return {
@@ -205,6 +372,150 @@ class TransacaoCashback(db.Model):
             'data_transacao': self.data_transacao.isoformat() if self.data_transacao else None
         }
 
+class ResumoMensalCliente(db.Model):
+    """Totais mensais de compras por cliente, mantidos junto com as escritas de pedidos"""
+    __table_args__ = (
+        db.UniqueConstraint('cliente_id', 'ano', 'mes', name='uq_resumo_mensal_cliente'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+    total_kg = db.Column(db.Float, nullable=False, default=0.0)
+    total_valor = db.Column(db.Float, nullable=False, default=0.0)
+    numero_pedidos = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def obter(cls, cliente_id, ano, mes):
+        return cls.query.filter_by(cliente_id=cliente_id, ano=ano, mes=mes).first()
+
+    @classmethod
+    def registrar(cls, cliente_id, data, quantidade_kg, valor_total, numero_pedidos=1):
+        """Acumula um pedido (ou o estorno dele, com valores negativos) no mês da data"""
+        atualizados = cls.query.filter_by(
+            cliente_id=cliente_id, ano=data.year, mes=data.month
+        ).update({
+            cls.total_kg: cls.total_kg + quantidade_kg,
+            cls.total_valor: cls.total_valor + valor_total,
+            cls.numero_pedidos: cls.numero_pedidos + numero_pedidos
+        })
+        if not atualizados:
+            db.session.add(cls(
+                cliente_id=cliente_id,
+                ano=data.year,
+                mes=data.month,
+                total_kg=quantidade_kg,
+                total_valor=valor_total,
+                numero_pedidos=numero_pedidos
+            ))
+
+    @classmethod
+    def registrar_pedido(cls, pedido, sinal=1):
+        cls.registrar(
+            pedido.cliente_id,
+            pedido.data_pedido,
+            sinal * pedido.quantidade_kg,
+            sinal * pedido.valor_total,
+            sinal
+        )
+
+    @classmethod
+    def reconstruir(cls):
+        """Recalcula todos os resumos a partir da tabela de pedidos"""
+        ano = db.extract('year', Pedido.data_pedido)
+        mes = db.extract('month', Pedido.data_pedido)
+        linhas = db.session.query(
+            Pedido.cliente_id,
+            ano,
+            mes,
+            db.func.sum(Pedido.quantidade_kg),
+            db.func.sum(Pedido.valor_total),
+            db.func.count(Pedido.id)
+        ).filter(
+            Pedido.status != 'cancelado'
+        ).group_by(Pedido.cliente_id, ano, mes).all()
+
+        cls.query.delete()
+        db.session.add_all([
+            cls(
+                cliente_id=cliente_id,
+                ano=int(a),
+                mes=int(m),
+                total_kg=total_kg or 0,
+                total_valor=total_valor or 0,
+                numero_pedidos=numero_pedidos
+            )
+            for cliente_id, a, m, total_kg, total_valor, numero_pedidos in linhas
+        ])
+
+    def to_dict(self):
+        return {
+            'cliente_id': self.cliente_id,
+            'ano': self.ano,
+            'mes': self.mes,
+            'total_kg': self.total_kg,
+            'total_valor': self.total_valor,
+            'numero_pedidos': self.numero_pedidos
+        }
+
+def reconciliar_cashback(corrigir=False, tolerancia=0.005):
+    """Confere os contadores de cashback dos clientes contra o extrato de transações.
+
+    Retorna as divergências encontradas; com corrigir=True os contadores
+    total_ganho/total_usado são reescritos a partir do extrato (o saldo só é reportado).
+    """
+    totais = {}
+    for cliente_id, tipo, total in db.session.query(
+        TransacaoCashback.cliente_id,
+        TransacaoCashback.tipo,
+        db.func.sum(TransacaoCashback.valor)
+    ).group_by(TransacaoCashback.cliente_id, TransacaoCashback.tipo):
+        totais[(cliente_id, tipo)] = total or 0
+
+    divergencias = []
+    for cliente in Cliente.query.order_by(Cliente.id).yield_per(1000):
+        ganho = totais.get((cliente.id, 'ganho'), 0)
+        usado = totais.get((cliente.id, 'uso'), 0)
+
+        if (abs((cliente.cashback_total_ganho or 0) - ganho) <= tolerancia
+                and abs((cliente.cashback_total_usado or 0) - usado) <= tolerancia
+                and abs((cliente.cashback_acumulado or 0) - (ganho - usado)) <= tolerancia):
+            continue
+
+        divergencias.append({
+            'cliente_id': cliente.id,
+            'user_id': cliente.user_id,
+            'total_ganho': cliente.cashback_total_ganho,
+            'total_ganho_extrato': ganho,
+            'total_usado': cliente.cashback_total_usado,
+            'total_usado_extrato': usado,
+            'saldo': cliente.cashback_acumulado,
+            'saldo_extrato': ganho - usado
+        })
+        if corrigir:
+            cliente.cashback_total_ganho = ganho
+            cliente.cashback_total_usado = usado
+
+    return divergencias
+
+class VendaDiaria(db.Model):
+    """Cubo de vendas pré-agregado por dia e dimensões do pedido/cliente"""
+    __table_args__ = (
+        db.Index('ix_venda_diaria_dia', 'dia'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    dia = db.Column(db.Date, nullable=False)
+    tipo_cafe = db.Column(db.String(50), nullable=True)
+    tipo_torra = db.Column(db.String(50), nullable=True)
+    status = db.Column(db.String(20), nullable=True)
+    estado = db.Column(db.String(2), nullable=True)
+    cidade = db.Column(db.String(50), nullable=True)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    volume = db.Column(db.Float, nullable=False, default=0.0)
+    faturamento = db.Column(db.Float, nullable=False, default=0.0)
+
 class ConfiguracaoSistema(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     chave = db.Column(db.String(50), unique=True, nullable=False)